@@ -1,70 +1,452 @@
+from threading import Thread
 from time import time
 from Bot import Bot
+from BitBoard import BitBoard, iterate_bits
+from ChainAnalyzer import ChainAnalyzer
+from EndgameAnalyzer import EndgameAnalyzer
+from EndgameTablebase import EndgameTablebase
+from Evaluation import evaluate_states
 from GameAction import GameAction
 from GameState import GameState
-from typing import List
+from MoveOrdering import MoveOrderer
+from SearchPosition import SearchPosition, Position
+from Symmetry import SymmetryTables
+from TimeManager import TimeManager, CLOCK_CHECK_MASK
+from TranspositionTable import TranspositionTable, ZobristKeys, EXACT, LOWER_BOUND, UPPER_BOUND
+from typing import Dict, List, Optional, Sequence
 import numpy as np
+import random
 
 TIMEOUT = 4.995
 
+# == Search algorithms
+ALPHA_BETA = "alphabeta"
+PVS = "pvs"
+MTDF = "mtdf"
+ALGORITHMS = (ALPHA_BETA, PVS, MTDF)
+
 
 class AdversarialSearchBot(Bot):
 
     # == Initialize bot
-    def __init__(self):
+    def __init__(
+        self,
+        transposition_table_size: int = 1 << 17,
+        use_symmetry: bool = False,
+        move_orderer: Optional[MoveOrderer] = None,
+        use_tablebase: bool = True,
+        time_manager: Optional[TimeManager] = None,
+        algorithm: str = ALPHA_BETA,
+        aspiration_window: int = 0,
+        compound_moves: bool = True,
+        quiescence: bool = True,
+        use_endgame_analyzer: bool = True,
+        timeout: float = TIMEOUT,
+    ):
+        """
+        algorithm: ALPHA_BETA (full window), PVS (null window tests of every
+            move after the first) or MTDF (null window tests of the root
+            converging on its value, from the previous iteration's value)
+        aspiration_window: with ALPHA_BETA or PVS, half width of the root
+            window around the previous iteration's value, 0 for a full
+            window. A root value outside the window is searched again.
+        compound_moves: below the root, taking every capturable box, or
+            all but the last two (four) and double-dealing, is one move,
+            and only the double-dealing one costs a ply
+        quiescence: without compound_moves, capturable boxes at the depth
+            limit are resolved the same way before evaluating
+        use_endgame_analyzer: solve simple endgames of independent chains
+            and loops exactly, at the root without any search
+        """
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"unknown search algorithm {algorithm!r}")
+        self.algorithm = algorithm
+        self.aspiration_window = aspiration_window
+        self.compound_moves = compound_moves
+        self.quiescence = quiescence
         self.is_player1 = True
         self.global_time = 0
+        self.timeout = timeout
+        self.time_manager = time_manager if time_manager is not None else TimeManager(timeout)
+        self.transposition_table = TranspositionTable(transposition_table_size)
+        self.zobrist: Optional[ZobristKeys] = None
+        self.use_symmetry = use_symmetry
+        self.symmetry: Optional[SymmetryTables] = None
+        self.move_orderer = move_orderer if move_orderer is not None else MoveOrderer()
+        self.use_tablebase = use_tablebase
+        self.tablebase: Optional[EndgameTablebase] = None
+        self.use_endgame_analyzer = use_endgame_analyzer
+        self.endgame_analyzer: Optional[EndgameAnalyzer] = None
+        self.table_player1: Optional[bool] = None
+        self.search_depth = 0
+        self.principal_variation: List[int] = []
+        self.ponder_thread: Optional[Thread] = None
+        # == Shared flag with a value, set to stop the search like the clock (ParallelSearchBot workers)
+        self.cancel_flag = None
+        self.ponder_board: Optional[BitBoard] = None
+        self.ponder_generations: Dict[int, int] = {}
+
+        # == Statistics of the last search
+        self.nodes = 0
+        self.depth_times: List[float] = []
+        self.partial_depth = 0
+        self.ponder_nodes = 0
+        self.ponder_depth = 0
 
     # == Implement get action from bot class
     def get_action(self, state: GameState) -> GameAction:
+        self.stop_pondering()
         self.is_player1 = state.player1_turn
 
-        selected_action: GameAction = None
-        self.global_time = time() + TIMEOUT
-
-        row_not_filled = np.count_nonzero(state.row_status == 0)
-        column_not_filled = np.count_nonzero(state.col_status == 0)
-        for i in range(row_not_filled + column_not_filled):
-            # if time() >= self.global_time:
-            #     break
-
+        start_time = time()
+        self.nodes = 0
+        self.depth_times = []
+        self.search_depth = 0
+        self.partial_depth = 0
+        self.principal_variation = []
+
+        # == Search is done on the bitboard representation of the state
+        board = BitBoard.from_state(state)
+        self.global_time = self.time_manager.start_move(board)
+
+        # == A forced move needs no search
+        if board.free_edges().bit_count() == 1:
+            self.time_manager.end_move()
+            return board.layout.edge_actions[next(board.legal_edges())]
+
+        self.prepare_transposition_table(board)
+        self.resume_pondered_search(board)
+
+        # == A simple endgame is solved without search
+        if self.endgame_analyzer is not None:
+            move_values = self.endgame_analyzer.move_values(board)
+            if move_values is not None:
+                self.time_manager.end_move()
+                return board.layout.edge_actions[self.select_best(move_values)]
+
+        self.move_orderer.new_search()
+        position = SearchPosition(board, self.zobrist)
+
+        # == The most promising move by ordering alone is ready before any search
+        selected = self.generate_actions(board)[0]
+        scores = {}
+        guess = None
+        for i in range(board.free_edges().bit_count()):
+            # == Search the selected move of the previous iteration first
+            actions = self.generate_actions(board)
+            actions.sort(key=lambda action: (scores.get(
+                action, -np.inf), action == selected), reverse=True)
+
+            scores = {}
             try:
-                actions = self.generate_actions(state)
-                utilities = np.array([self.get_minimax_value(
-                    state=self.get_result(state, action), max_depth=i + 1) for action in actions])
-                index = np.random.choice(
-                    np.flatnonzero(utilities == utilities.max()))
-                selected_action = actions[index]
+                if self.algorithm == MTDF:
+                    self.search_root_mtdf(
+                        position, actions, i + 1, guess, scores)
+                else:
+                    self.search_root_aspiration(
+                        position, actions, i + 1, guess, scores)
             except TimeoutError:
+                # == The selected move was searched first, an exact higher value beats it
+                if selected in scores and max(scores.values()) > scores[selected]:
+                    selected = self.select_best(scores)
+                    self.partial_depth = i + 1
                 break
 
-        return selected_action
-
-    # == Generate list of game action
-    def generate_actions(self, state: GameState) -> List[GameAction]:
-        row_positions = self.generate_positions(state.row_status)
-        col_positions = self.generate_positions(state.col_status)
-        actions: List[GameAction] = []
-
-        # TODO: Menambahkan heuristik move ordering
-        for position in row_positions:
-            actions.append(GameAction("row", position))
-        for position in col_positions:
-            actions.append(GameAction("col", position))
-
-        return actions
+            best = max(scores.values())
+            previous = selected
+            selected = self.select_best(scores)
+            guess = best
+            self.search_depth = i + 1
+            self.depth_times.append(time() - start_time)
+            self.principal_variation = self.get_principal_variation(
+                position, selected, i + 2)
+
+            # == Stop on a proven result, or when the time manager says so
+            best_changed = scores.get(previous, -np.inf) < best
+            if abs(best) == np.inf or not self.time_manager.continue_search(best_changed):
+                break
 
-    # == Generate valid position
-    def generate_positions(self, matrix: np.ndarray):
-        [ny, nx] = matrix.shape
-        positions: List[tuple[int, int]] = []
+        self.time_manager.end_move()
+        return board.layout.edge_actions[selected]
+
+    # == One of the best root moves at random
+    def select_best(self, scores: Dict[int, float]) -> int:
+        best = max(scores.values())
+        return random.choice([action for action, score in scores.items() if score == best])
+
+    # == Search the opponent's turn in the background, until stop_pondering or get_action
+    def ponder(self, state: GameState):
+        """
+        The transposition table is kept for the next move, and every reply
+        of the opponent is searched in its own table generation. get_action
+        makes the generation of the reply actually played current again
+        (resume_pondered_search), so that subtree is kept, while entries of
+        the other replies count as an older search and are replaced first.
+        """
+        self.stop_pondering()
+        self.is_player1 = not state.player1_turn
+        self.global_time = np.inf
+        self.principal_variation = []
+        self.ponder_nodes = 0
+        self.ponder_depth = 0
+
+        board = BitBoard.from_state(state)
+        self.prepare_transposition_table(board)
+        self.move_orderer.new_search()
+        replies = self.generate_actions(board)
+        self.ponder_board = board
+        self.ponder_generations = {
+            reply: self.transposition_table.new_search() for reply in replies}
+        self.ponder_thread = Thread(
+            target=self.ponder_search, args=(board, replies), daemon=True)
+        self.ponder_thread.start()
+
+    def ponder_search(self, board: BitBoard, replies: List[int]):
+        """
+        Deepens, for every reply of the opponent, the same root search
+        get_action would run after it, so its table entries match the
+        windows of that search.
+        """
+        position = SearchPosition(board, self.zobrist)
+        scores: Dict[int, Dict[int, float]] = {}
+        self.nodes = 0
+        try:
+            for i in range(board.free_edges().bit_count() - 1):
+                for reply in replies:
+                    self.transposition_table.resume_search(self.ponder_generations[reply])
+                    position.make(reply)
+                    if position.player1_turn != self.is_player1:
+                        # The opponent moves again, search on as usual
+                        self.get_minimax_value(position, max_depth=i + 1)
+                    elif not position.is_terminal():
+                        previous = scores.get(reply, {})
+                        actions = self.generate_actions(position)
+                        actions.sort(key=lambda action: previous.get(
+                            action, -np.inf), reverse=True)
+                        scores[reply] = self.search_root_moves(
+                            position, actions, i + 1)
+                    position.unmake()
+                self.ponder_depth = i + 1
+        except TimeoutError:
+            pass
+        self.ponder_nodes = self.nodes
+
+    def stop_pondering(self):
+        if self.ponder_thread is None:
+            return
+        self.cancel()
+        self.ponder_thread.join()
+        self.ponder_thread = None
+
+    # == Make the table generation of the reply played after ponder current
+    def resume_pondered_search(self, board: BitBoard):
+        ponder_board, generations = self.ponder_board, self.ponder_generations
+        self.ponder_board = None
+        self.ponder_generations = {}
+        if ponder_board is None or ponder_board.layout is not board.layout:
+            return
+        if ponder_board.edges & ~board.edges:
+            return
+
+        played = [edge for edge in iterate_bits(board.edges & ~ponder_board.edges) if edge in generations]
+        # == The opponent moved again after a box, so its first reply completed one
+        scored = [edge for edge in played
+                  if ponder_board.get_result(edge).player1_turn == ponder_board.player1_turn]
+        if len(played) > 1 and scored:
+            played = scored
+        if played:
+            self.transposition_table.resume_search(generations[played[0]])
+
+    # == The search stops at its next node, as on a timeout
+    def cancel(self):
+        self.global_time = 0
 
-        for y in range(ny):
-            for x in range(nx):
-                if matrix[y, x] == 0:
-                    positions.append((x, y))
+    def search_root_moves(
+        self,
+        position: SearchPosition,
+        actions: List[int],
+        max_depth: int,
+        shared_best=None,
+        scores: Optional[Dict[int, float]] = None,
+        alpha: float = -np.inf,
+        beta: float = np.inf,
+    ) -> Dict[int, float]:
+        """
+        Values of the root moves `actions`, searched in order. Each value
+        is added to `scores` as soon as it is known, so the moves searched
+        before a TimeoutError are kept.
+
+        Moves which cannot reach the best value found so far only need an
+        upper bound, the utilities are integers so ties stay exact. With
+        shared_best (a multiprocessing.Value of the best value found by
+        other searchers of the same root), that bound is shared as well.
+        Values are exact between alpha and beta; the search stops at the
+        first move above beta, whose value is then a lower bound.
+        """
+        if scores is None:
+            scores = {}
+        pv_move = self.principal_variation[0] if self.principal_variation else None
+        best = -np.inf
+        for action in actions:
+            if shared_best is not None:
+                best = max(best, shared_best.value)
+            if best == np.inf or best > beta:
+                break
 
-        return positions
+            position.make(action)
+            scores[action] = self.get_minimax_value(
+                position=position,
+                max_depth=max_depth,
+                alpha=max(best, alpha) - 1,
+                beta=beta + 1,
+                on_pv=action == pv_move,
+            )
+            position.unmake()
+            best = max(best, scores[action])
+
+            if shared_best is not None:
+                with shared_best.get_lock():
+                    if best > shared_best.value:
+                        shared_best.value = best
+        return scores
+
+    def search_root_aspiration(
+        self,
+        position: SearchPosition,
+        actions: List[int],
+        max_depth: int,
+        guess: Optional[float],
+        scores: Dict[int, float],
+    ):
+        """
+        Root search in a window of aspiration_window around guess. A side
+        of the window the best value falls out of is opened and the root
+        searched again, the failing move first.
+        """
+        alpha = -np.inf
+        beta = np.inf
+        if self.aspiration_window and guess is not None and abs(guess) != np.inf:
+            alpha = guess - self.aspiration_window
+            beta = guess + self.aspiration_window
+
+        while True:
+            scores.clear()
+            try:
+                self.search_root_moves(
+                    position, actions, max_depth, scores=scores, alpha=alpha, beta=beta)
+            except TimeoutError:
+                # Values at or below alpha are upper bounds, none of them is better than another
+                if alpha != -np.inf:
+                    for action, score in scores.items():
+                        if score <= alpha:
+                            scores[action] = alpha - 1
+                raise
+
+            best = max(scores.values())
+            if alpha <= best <= beta:
+                return
+            if best > beta:
+                beta = np.inf
+            else:
+                alpha = -np.inf
+            actions = sorted(actions, key=lambda action: scores.get(
+                action, -np.inf), reverse=True)
+
+    def search_root_mtdf(
+        self,
+        position: SearchPosition,
+        actions: List[int],
+        max_depth: int,
+        guess: Optional[float],
+        scores: Dict[int, float],
+    ):
+        """
+        MTD(f): null window tests of the root value converging from guess.
+        Only the best move gets a value in scores, once it is exact.
+        """
+        # == Tests are kept inside the utilities, every finite one lies in [-boxes, boxes + 1]
+        limit = position.layout.num_boxes + 2
+        lower = -np.inf
+        upper = np.inf
+        value = guess if guess is not None else 0
+        best_action = actions[0]
+        while lower < upper:
+            gamma = value + 1 if value == lower else value
+            gamma = min(max(gamma, 1 - limit), limit)
+
+            # Is any move worth at least gamma
+            value = -np.inf
+            pv_move = self.principal_variation[0] if self.principal_variation else None
+            for action in actions:
+                position.make(action)
+                child_value = self.get_minimax_value(
+                    position=position,
+                    max_depth=max_depth,
+                    alpha=gamma - 1,
+                    beta=gamma,
+                    on_pv=action == pv_move,
+                )
+                position.unmake()
+                if child_value > value:
+                    value = child_value
+                    if value >= gamma:
+                        best_action = action
+                        break
+
+            if value < gamma:
+                upper = value
+            else:
+                lower = value
+                actions = [best_action] + \
+                    [action for action in actions if action != best_action]
+
+        scores[best_action] = lower
+
+    # == Best line of the last iteration, followed through the transposition table
+    def get_principal_variation(self, position: SearchPosition, first_move: int, max_length: int) -> List[int]:
+        line = [first_move]
+        position.make(first_move)
+        while len(line) < max_length and not position.is_terminal():
+            entry_key, transform = self.table_key(position, position.key)
+            entry = self.transposition_table.probe(entry_key)
+            if entry is None or entry.best_move is None:
+                break
+            move = entry.best_move
+            if transform:
+                move = self.symmetry.restore_edge(move, transform)
+            if move not in position.free_index:
+                break
+            line.append(move)
+            position.make(move)
+        for _ in line:
+            position.unmake()
+        return line
+
+    # == Keep the table across moves, values are only valid for one side and board size
+    def prepare_transposition_table(self, board: BitBoard):
+        zobrist = ZobristKeys.get(board.layout)
+        if zobrist is not self.zobrist or self.is_player1 != self.table_player1:
+            self.transposition_table.clear()
+            self.zobrist = zobrist
+            self.table_player1 = self.is_player1
+            if self.use_symmetry:
+                self.symmetry = SymmetryTables.get(board.layout)
+            if self.use_tablebase:
+                self.tablebase = EndgameTablebase.get(board.layout)
+            if self.use_endgame_analyzer:
+                self.endgame_analyzer = EndgameAnalyzer.get(board.layout)
+        self.transposition_table.new_search()
+
+    # == Transposition table key of a position and the transform to the frame it is stored in
+    def table_key(self, board: Position, key: int):
+        if self.symmetry is None:
+            return key, 0
+        canonical, transform = self.symmetry.canonicalize(board)
+        return self.zobrist.hash(canonical), transform
+
+    # == Generate list of unmarked edges, most promising first
+    def generate_actions(self, board: Position, ply: int = 0, tt_move: Optional[int] = None) -> List[int]:
+        return self.move_orderer.order(board, ply, tt_move)[0]
 
     # == Update board
     def get_result(self, state: GameState, action: GameAction) -> GameState:
@@ -121,153 +503,244 @@ class AdversarialSearchBot(Bot):
 
     def get_minimax_value(
         self,
-        state: GameState,
+        position: SearchPosition,
         depth: int = 0,
         max_depth: int = 0,
         alpha: float = -np.inf,
         beta: float = np.inf,
+        on_pv: bool = False,
     ) -> float:
-        if time() >= self.global_time:
+        self.nodes += 1
+        if self.nodes & CLOCK_CHECK_MASK == 0 and (
+                time() >= self.global_time or self.cancel_flag is not None and self.cancel_flag.value):
             raise TimeoutError()
 
-        if self.terminal_test(state) or depth == max_depth:
-            return self.get_utility(state)
+        # == Reuse the value of a transposition searched at least as deep
+        remaining = max_depth - depth
+        entry_key, transform = self.table_key(position, position.key)
+        entry = self.transposition_table.probe(entry_key)
+        tt_move = None
+        if entry is not None and entry.best_move is not None:
+            tt_move = entry.best_move
+            if transform:
+                tt_move = self.symmetry.restore_edge(tt_move, transform)
+        if entry is not None and entry.depth >= remaining:
+            if entry.bound == EXACT:
+                return entry.value
+            if entry.bound == LOWER_BOUND:
+                alpha = max(alpha, entry.value)
+            else:
+                beta = min(beta, entry.value)
+            if beta <= alpha:
+                return entry.value
+
+        # == Exact value of an endgame stored in the tablebase
+        if self.tablebase is not None:
+            margin = self.tablebase.probe(position)
+            if margin is not None:
+                value = self.get_exact_utility(position, margin)
+                self.transposition_table.store(
+                    entry_key, position.layout.num_edges, value, EXACT)
+                return value
+
+        # == Exact value of a simple endgame, every untaken box has at least two sides
+        box_sides = position.box_sides
+        if self.endgame_analyzer is not None and 0 not in box_sides and 1 not in box_sides:
+            margin = self.endgame_analyzer.value(position)
+            if margin is not None:
+                value = self.get_exact_utility(position, margin)
+                self.transposition_table.store(
+                    entry_key, position.layout.num_edges, value, EXACT)
+                return value
+
+        if self.terminal_test(position):
+            value = self.get_utility(position)
+            self.transposition_table.store(
+                entry_key, position.layout.num_edges, value, EXACT)
+            return value
+
+        # == Pending captures are resolved before the position is evaluated
+        if (self.compound_moves or self.quiescence and depth >= max_depth) and 3 in position.box_sides:
+            return self.get_capture_value(position, depth, max_depth, alpha, beta)
+
+        if depth >= max_depth:
+            value = self.get_utility(position)
+            self.transposition_table.store(entry_key, 0, value, EXACT)
+            return value
+
+        original_alpha = alpha
+        original_beta = beta
+        best_action = None
+
+        # == The line of the previous iteration is searched first
+        pv_move = None
+        if on_pv and depth + 1 < len(self.principal_variation):
+            pv_move = self.principal_variation[depth + 1]
+            tt_move = pv_move
 
         # Jika belum ketemu, maka akan dicari solusinya dengan dfs dengan turn yang bergantian.
         # Jika nilai terbaik dari maximizer sudah sama atau melebihi nilai terbaik dari minimizer (alpha lebih dari sama dengan beta)
         # Pencarian neighbor dapat dihentikan karena dapat dipastikan nilai minimum yang kita cari merupakan langkah optimum musuh
-        if self.is_player1 == state.player1_turn:
+        if self.is_player1 == position.player1_turn:
             value = -np.inf
-            actions = self.generate_actions(state)
-            for action in actions:
-                value = max(
-                    value,
-                    self.get_minimax_value(
-                        self.get_result(state, action),
-                        depth=depth + 1,
-                        max_depth=max_depth,
-                        alpha=alpha,
-                        beta=beta
-                    ),
-                )
+            actions, first_source = self.move_orderer.order(
+                position, depth, tt_move)
+            for index, action in enumerate(actions):
+                position.make(action)
+                child_value = self.get_child_value(
+                    position, depth + 1, max_depth, alpha, beta, action == pv_move, index > 0, True)
+                position.unmake()
+                if best_action is None or child_value > value:
+                    value = child_value
+                    best_action = action
                 alpha = max(alpha, value)
                 if beta <= alpha:
+                    self.move_orderer.record_cutoff(
+                        position, action, depth, remaining, index, first_source)
                     break
-            return value
         else:
             value = np.inf
-            actions = self.generate_actions(state)
-            for action in actions:
-                value = min(
-                    value,
-                    self.get_minimax_value(
-                        self.get_result(state, action),
-                        depth=depth + 1,
-                        max_depth=max_depth,
-                        alpha=alpha,
-                        beta=beta
-                    ),
-                )
+            actions, first_source = self.move_orderer.order(
+                position, depth, tt_move)
+            for index, action in enumerate(actions):
+                position.make(action)
+                child_value = self.get_child_value(
+                    position, depth + 1, max_depth, alpha, beta, action == pv_move, index > 0, False)
+                position.unmake()
+                if best_action is None or child_value < value:
+                    value = child_value
+                    best_action = action
                 beta = min(beta, value)
                 if beta <= alpha:
+                    self.move_orderer.record_cutoff(
+                        position, action, depth, remaining, index, first_source)
                     break
-            return value
+
+        if value <= original_alpha:
+            bound = UPPER_BOUND
+        elif value >= original_beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        if transform:
+            best_action = self.symmetry.transform_edge(best_action, transform)
+        self.transposition_table.store(
+            entry_key, remaining, value, bound, best_action)
+        return value
+
+    def get_capture_value(
+        self,
+        position: SearchPosition,
+        depth: int,
+        max_depth: int,
+        alpha: float,
+        beta: float,
+    ) -> float:
+        """
+        Value of a position with capturable boxes over its compound moves.
+        After taking everything the same player moves on at the same depth,
+        a double-dealing sequence passes the turn.
+        """
+        take_all, declines = ChainAnalyzer.get(
+            position.layout).capture_sequences(position)
+        maximizing = self.is_player1 == position.player1_turn
+        value = -np.inf if maximizing else np.inf
+        for index, sequence in enumerate([take_all] + declines):
+            for edge in sequence:
+                position.make(edge)
+            child_value = self.get_minimax_value(
+                position, depth + (index > 0), max_depth, alpha, beta)
+            for _ in sequence:
+                position.unmake()
+
+            if maximizing:
+                value = max(value, child_value)
+                alpha = max(alpha, value)
+            else:
+                value = min(value, child_value)
+                beta = min(beta, value)
+            if beta <= alpha:
+                break
+        return value
+
+    def get_child_value(
+        self,
+        position: SearchPosition,
+        depth: int,
+        max_depth: int,
+        alpha: float,
+        beta: float,
+        on_pv: bool,
+        null_window: bool,
+        maximizing: bool,
+    ) -> float:
+        """
+        With PVS, a move after the first is tested with a null window on
+        the bound of the side to move, and only searched again with the
+        full window when it turns out to be better.
+        """
+        if self.algorithm == PVS and null_window:
+            if maximizing and alpha != -np.inf:
+                value = self.get_minimax_value(
+                    position, depth, max_depth, alpha, alpha + 1, on_pv)
+                if not alpha < value < beta:
+                    return value
+            elif not maximizing and beta != np.inf:
+                value = self.get_minimax_value(
+                    position, depth, max_depth, beta - 1, beta, on_pv)
+                if not alpha < value < beta:
+                    return value
+        return self.get_minimax_value(position, depth, max_depth, alpha, beta, on_pv)
 
     # == Check if terminal leaf has box
-    def terminal_test(self, state: GameState) -> bool:
-        return np.all(state.row_status == 1) and np.all(state.col_status == 1)
+    def terminal_test(self, board: Position) -> bool:
+        return board.is_terminal()
 
     # Utility function dengan nilai absolute 1 jika box terbentuk.
-    def get_utility(self, state: GameState) -> float:
-        [ny, nx] = state.board_status.shape
-        utility = 0
-
+    def get_utility(self, board: Position) -> float:
         # == Count boxes
-        box_won = 0
-        box_lost = 0
-        for y in range(ny):
-            for x in range(nx):
-                if self.is_player1:
-                    if state.board_status[y, x] == -4:
-                        utility += 1
-                        box_won += 1
-                    elif state.board_status[y, x] == 4:
-                        utility -= 1
-                        box_lost += 1
-                else:
-                    if state.board_status[y, x] == -4:
-                        utility -= 1
-                        box_lost += 1
-                    elif state.board_status[y, x] == 4:
-                        utility += 1
-                        box_won += 1
+        if self.is_player1:
+            box_won = board.player1_boxes.bit_count()
+            box_lost = board.player2_boxes.bit_count()
+        else:
+            box_won = board.player2_boxes.bit_count()
+            box_lost = board.player1_boxes.bit_count()
+        utility = box_won - box_lost
 
         # Chain rule
-        if self.chain_count(state) % 2 == 0 and self.is_player1:
+        chain_count = self.chain_count(board)
+        if chain_count % 2 == 0 and self.is_player1:
             utility += 1
-        elif self.chain_count(state) % 2 != 0 and not self.is_player1:
+        elif chain_count % 2 != 0 and not self.is_player1:
             utility += 1
 
         # Win/Lose Heuristics
-        if box_won >= 5:
+        if 2 * box_won > board.layout.num_boxes:
             utility = np.inf
-        elif box_lost >= 5:
+        elif 2 * box_lost > board.layout.num_boxes:
             utility = -np.inf
 
         return utility
 
-    # Count the number of long chain(s)
-    def chain_count(self, state: GameState) -> int:
-
-        chain_count = 0
-        chain_list: List[List[int]] = []
-
-        for box_num in range(9):
-
-            # Check if box is already part of a chain
-            flag = False
-            for chain in chain_list:
-                if box_num in chain:
-                    flag = True
-                    break
-
-            if not flag:
-                chain_list.append([box_num])
-                self.add_chain(state, chain_list, box_num)
-
-        for chain in chain_list:
-            if len(chain) >= 3:
-                chain_count += 1
-
-        return chain_count
-
-    # Find adjacent box(es) which can build chain
-    def add_chain(self, state: GameState, chain_list: List[List[int]], box_num):
-
-        neighbors_num = [box_num - 1, box_num - 3, box_num + 1, box_num + 3]
+    # == Utility of the end of the game, margin being what the player to move still gets
+    def get_exact_utility(self, board: Position, margin: int) -> float:
+        if board.player1_turn != self.is_player1:
+            margin = -margin
+        if self.is_player1:
+            margin += board.player1_boxes.bit_count() - board.player2_boxes.bit_count()
+        else:
+            margin += board.player2_boxes.bit_count() - board.player1_boxes.bit_count()
 
-        for idx in range(len(neighbors_num)):
-            if (
-                neighbors_num[idx] < 0
-                or neighbors_num[idx] > 8
-                or (idx % 2 == 0 and neighbors_num[idx] // 3 != box_num // 3)
-            ):
-                continue
+        if margin > 0:
+            return np.inf
+        if margin < 0:
+            return -np.inf
+        return 0
 
-            flag = False
-            for chain in chain_list:
-                if neighbors_num[idx] in chain:
-                    flag = True
-                    break
+    # == Utility of a stack of leaf states in one NumPy call, same values as get_utility
+    def evaluate_many(self, states: Sequence[GameState]) -> np.ndarray:
+        return evaluate_states(states, self.is_player1)
 
-            if not flag and idx % 2 == 0:
-                reference = max(box_num, neighbors_num[idx])
-                if not state.col_status[reference // 3][reference % 3]:
-                    chain_list[-1].append(neighbors_num[idx])
-                    self.add_chain(state, chain_list, neighbors_num[idx])
-
-            if not flag and idx % 2 != 0:
-                reference = max(box_num, neighbors_num[idx])
-                if not state.row_status[reference // 3][reference % 3]:
-                    chain_list[-1].append(neighbors_num[idx])
-                    self.add_chain(state, chain_list, neighbors_num[idx])
+    # Count the number of long chain(s)
+    def chain_count(self, board: Position) -> int:
+        return ChainAnalyzer.get(board.layout).count_long_regions(board)
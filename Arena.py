@@ -0,0 +1,224 @@
+from concurrent.futures import ProcessPoolExecutor
+from time import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from Bot import Bot
+from GameEngine import GameEngine
+import argparse
+import math
+import random
+import numpy as np
+
+BotFactory = Callable[[], Bot]
+
+
+class GameRecord(NamedTuple):
+    """
+    Outcome of one game, seen from bot A.
+
+    result: 1 for a win of bot A, 0.5 for a draw, 0 for a loss
+    a_is_player1: True if bot A moved first
+    scores: (bot A boxes, bot B boxes)
+    forfeit: True if the game ended by an illegal move or an error
+    move_times: total thinking time and number of moves of (bot A, bot B)
+    """
+
+    result: float
+    a_is_player1: bool
+    scores: Tuple[int, int]
+    forfeit: bool
+    move_times: Tuple[Tuple[float, int], Tuple[float, int]]
+
+
+class ArenaResult(NamedTuple):
+    """
+    Aggregated results of a match, seen from bot A.
+
+    score: (wins + draws / 2) / games
+    confidence_interval: interval of the score at the requested level
+    """
+
+    games: int
+    wins: int
+    draws: int
+    losses: int
+    forfeits: int
+    score: float
+    confidence_interval: Tuple[float, float]
+    average_move_time: Tuple[float, float]
+
+    def __str__(self) -> str:
+        low, high = self.confidence_interval
+        return (
+            f"games: {self.games}, W/D/L: {self.wins}/{self.draws}/{self.losses}"
+            f" (forfeits: {self.forfeits})\n"
+            f"score: {self.score:.3f} [{low:.3f}, {high:.3f}]\n"
+            f"average move time: A {self.average_move_time[0] * 1000:.2f} ms,"
+            f" B {self.average_move_time[1] * 1000:.2f} ms"
+        )
+
+
+def play_game(
+    bot_a: BotFactory,
+    bot_b: BotFactory,
+    a_is_player1: bool,
+    seed: int,
+    number_of_dots: int = 4,
+) -> GameRecord:
+    """
+    Plays one headless game. Both RNGs used by the bots are seeded, so a
+    game is reproducible as long as the bots do not depend on the clock.
+    """
+    random.seed(seed)
+    np.random.seed(seed % (1 << 32))
+
+    bots = (bot_a(), bot_b())
+    engine = GameEngine(number_of_dots)
+    move_time = [0.0, 0.0]
+    move_count = [0, 0]
+    forfeit = False
+    forfeiting = None
+
+    while not engine.is_gameover():
+        # == Index of the bot to move, 0 for A and 1 for B
+        index = 0 if engine.player1_turn == a_is_player1 else 1
+        start = time()
+        try:
+            action = bots[index].get_action(engine.get_state())
+        except Exception:
+            action = None
+        move_time[index] += time() - start
+        move_count[index] += 1
+
+        if not engine.is_valid(action):
+            forfeit = True
+            forfeiting = index
+            break
+        engine.apply(action)
+
+    player1_score, player2_score = engine.get_scores()
+    scores = (player1_score, player2_score) if a_is_player1 else (
+        player2_score, player1_score)
+
+    if forfeit:
+        result = 0.0 if forfeiting == 0 else 1.0
+    elif scores[0] > scores[1]:
+        result = 1.0
+    elif scores[0] < scores[1]:
+        result = 0.0
+    else:
+        result = 0.5
+
+    return GameRecord(
+        result,
+        a_is_player1,
+        scores,
+        forfeit,
+        ((move_time[0], move_count[0]), (move_time[1], move_count[1])),
+    )
+
+
+def _play_game_task(task: Tuple[BotFactory, BotFactory, bool, int, int]) -> GameRecord:
+    return play_game(*task)
+
+
+def summarize(records: List[GameRecord], z: float = 1.96) -> ArenaResult:
+    """
+    The interval uses the normal approximation with the sample variance
+    of the per-game results, which accounts for draws.
+    """
+    games = len(records)
+    results = np.array([record.result for record in records])
+    wins = int(np.count_nonzero(results == 1.0))
+    draws = int(np.count_nonzero(results == 0.5))
+    losses = games - wins - draws
+    forfeits = sum(record.forfeit for record in records)
+
+    score = float(results.mean()) if games else 0.0
+    if games > 1:
+        margin = z * math.sqrt(results.var(ddof=1) / games)
+    else:
+        margin = 1.0
+    interval = (max(0.0, score - margin), min(1.0, score + margin))
+
+    average_move_time = []
+    for index in range(2):
+        total = sum(record.move_times[index][0] for record in records)
+        count = sum(record.move_times[index][1] for record in records)
+        average_move_time.append(total / count if count else 0.0)
+
+    return ArenaResult(
+        games,
+        wins,
+        draws,
+        losses,
+        forfeits,
+        score,
+        interval,
+        tuple(average_move_time),
+    )
+
+
+def run_arena(
+    bot_a: BotFactory,
+    bot_b: BotFactory,
+    games: int,
+    number_of_dots: int = 4,
+    workers: Optional[int] = None,
+    seed: int = 0,
+    z: float = 1.96,
+) -> ArenaResult:
+    """
+    Plays `games` games between two bots, alternating who moves first.
+
+    Bots are given as factories so every game starts with a fresh bot;
+    they must be picklable (a class or functools.partial, not a lambda)
+    when workers != 1. Game i is seeded with seed + i, so results do not
+    depend on the number of workers. workers=None uses every core.
+    """
+    tasks = [
+        (bot_a, bot_b, i % 2 == 0, seed + i, number_of_dots) for i in range(games)
+    ]
+
+    if workers == 1:
+        records = [_play_game_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            records = list(executor.map(
+                _play_game_task, tasks, chunksize=max(1, games // 64)))
+
+    return summarize(records, z)
+
+
+def get_bot_factories() -> Dict[str, BotFactory]:
+    from RandomBot import RandomBot
+    from AdversarialSearchBot import AdversarialSearchBot
+    from LocalSearchBot import LocalSearchBot
+    from MCTSBot import MCTSBot
+
+    return {
+        "random": RandomBot,
+        "adversarial": AdversarialSearchBot,
+        "local": LocalSearchBot,
+        "mcts": MCTSBot,
+    }
+
+
+if __name__ == "__main__":
+    factories = get_bot_factories()
+    parser = argparse.ArgumentParser(description="Headless bot-vs-bot arena")
+    parser.add_argument("bot_a", choices=sorted(factories))
+    parser.add_argument("bot_b", choices=sorted(factories))
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--dots", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(run_arena(
+        factories[args.bot_a],
+        factories[args.bot_b],
+        args.games,
+        number_of_dots=args.dots,
+        workers=args.workers,
+        seed=args.seed,
+    ))
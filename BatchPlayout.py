@@ -0,0 +1,104 @@
+from functools import lru_cache
+from time import time
+from BitBoard import BitBoard, BoardLayout
+from SearchPosition import Position
+import argparse
+import numpy as np
+
+# == Games advanced together, bounds the memory of a batch
+BATCH_SIZE = 1 << 14
+
+
+class BatchPlayout:
+    """
+    Uniformly random playouts of many games at once with NumPy.
+
+    All games of a batch start from the same position and therefore end
+    after the same number of moves, so they are advanced in lockstep: a
+    random order of the free edges is drawn for every game up front, then
+    each step marks one edge in every game, counts the sides of its boxes,
+    credits completed boxes to the player to move and switches the turn
+    of the games that did not score. Boxes are columns of a side count
+    array, with a padding column for the missing box of border edges.
+    Draws come from np.random, so seeding it makes playouts reproducible.
+    Use BatchPlayout.get(layout) to obtain a shared instance.
+    """
+
+    def __init__(self, layout: BoardLayout):
+        self.layout = layout
+
+        # == Edge -> its two boxes, num_boxes for the padding box
+        edge_boxes = np.full((layout.num_edges, 2), layout.num_boxes, dtype=np.intp)
+        for edge, boxes in enumerate(layout.edge_boxes):
+            edge_boxes[edge, :len(boxes)] = boxes
+        self.edge_boxes = edge_boxes
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get(layout: BoardLayout) -> "BatchPlayout":
+        return BatchPlayout(layout)
+
+    def play(self, board: Position, games: int) -> np.ndarray:
+        """
+        Plays `games` random games from board and returns their final
+        scores as an int array of shape (games, 2): player 1, player 2.
+        """
+        scores = np.empty((games, 2), dtype=np.int32)
+        for start in range(0, games, BATCH_SIZE):
+            stop = min(games, start + BATCH_SIZE)
+            scores[start:stop] = self.play_batch(board, stop - start)
+        return scores
+
+    def play_batch(self, board: Position, games: int) -> np.ndarray:
+        layout = self.layout
+        free = np.array(list(board.legal_edges()), dtype=np.intp)
+
+        box_sides = np.zeros((games, layout.num_boxes + 1), dtype=np.int8)
+        box_sides[:, :layout.num_boxes] = [
+            (board.edges & mask).bit_count() for mask in layout.box_masks]
+        scores = np.zeros((games, 2), dtype=np.int32)
+        scores[:, 0] = board.player1_boxes.bit_count()
+        scores[:, 1] = board.player2_boxes.bit_count()
+        # == 0 while player 1 is to move, 1 for player 2
+        mover = np.full(games, 0 if board.player1_turn else 1, dtype=np.intp)
+
+        # == Sorting random keys gives every game a uniform move order
+        order = free[np.argsort(np.random.random((games, len(free))), axis=1)]
+        games_index = np.arange(games)[:, None]
+
+        for step in range(len(free)):
+            boxes = self.edge_boxes[order[:, step]]
+            box_sides[games_index, boxes] += 1
+            # The padding box collects every border edge, keep it empty
+            box_sides[:, -1] = 0
+            completed = np.count_nonzero(box_sides[games_index, boxes] == 4, axis=1)
+            scores[games_index[:, 0], mover] += completed
+            mover ^= completed == 0
+
+        return scores
+
+    def results(self, board: Position, games: int) -> np.ndarray:
+        """
+        Result of every game for player 1: 1 for a win, 0.5 for a draw,
+        0 for a loss.
+        """
+        scores = self.play(board, games)
+        return (np.sign(scores[:, 0] - scores[:, 1]) + 1) / 2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Random playouts from the empty board")
+    parser.add_argument("--dots", type=int, default=4)
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    np.random.seed(args.seed)
+    layout = BoardLayout.get(args.dots - 1, args.dots - 1)
+    playout = BatchPlayout.get(layout)
+    start = time()
+    results = playout.results(BitBoard(0, 0, 0, True, layout), args.games)
+    elapsed = time() - start
+    print(f"player 1 score: {results.mean():.4f}, "
+          f"draws: {np.count_nonzero(results == 0.5) / args.games:.4f}")
+    print(f"{args.games} games in {elapsed:.2f} s ({args.games / elapsed:.0f} games/s)")
@@ -0,0 +1,267 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from time import time
+from typing import Callable, Dict, List, Optional, Tuple
+from Bot import Bot
+from BenchmarkPositions import POSITIONS, BenchmarkPosition
+import argparse
+import json
+import sys
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# == Minimum absolute increase of peak memory reported as a regression
+MEMORY_NOISE_BYTES = 1 << 20
+
+
+def get_benchmark_configs() -> Dict[str, Callable[..., Bot]]:
+    """
+    Bot configurations to benchmark. Every factory accepts a `timeout`
+    keyword and must be picklable.
+    """
+    from AdversarialSearchBot import AdversarialSearchBot, PVS, MTDF
+    from LocalSearchBot import LocalSearchBot
+    from ParallelSearchBot import ParallelSearchBot
+    from ParallelAnnealingBot import ParallelAnnealingBot
+    from MCTSBot import MCTSBot, PUCT, UNIFORM
+
+    return {
+        "adversarial": AdversarialSearchBot,
+        "adversarial-symmetry": partial(AdversarialSearchBot, use_symmetry=True),
+        "adversarial-no-ordering": _unordered_adversarial_bot,
+        "adversarial-pvs": partial(AdversarialSearchBot, algorithm=PVS),
+        "adversarial-pvs-aspiration": partial(AdversarialSearchBot, algorithm=PVS, aspiration_window=1),
+        "adversarial-mtdf": partial(AdversarialSearchBot, algorithm=MTDF),
+        "adversarial-no-compound": partial(AdversarialSearchBot, compound_moves=False, quiescence=False),
+        "adversarial-parallel": ParallelSearchBot,
+        "local": LocalSearchBot,
+        "local-parallel": partial(ParallelAnnealingBot, exchange_interval=50),
+        "mcts": MCTSBot,
+        "mcts-puct": partial(MCTSBot, selection=PUCT),
+        "mcts-uniform": partial(MCTSBot, rollout_policy=UNIFORM),
+        "mcts-batch": partial(MCTSBot, rollout_policy=UNIFORM, rollout_batch=64),
+    }
+
+
+def _unordered_adversarial_bot(timeout: float) -> Bot:
+    from AdversarialSearchBot import AdversarialSearchBot
+    from MoveOrdering import MoveOrderer, RASTER
+
+    return AdversarialSearchBot(
+        move_orderer=MoveOrderer(stages=(RASTER,), use_history=False),
+        timeout=timeout,
+    )
+
+
+def peak_memory() -> Optional[int]:
+    # == Peak resident set size of this process in bytes
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def measure(config: str, position: BenchmarkPosition, timeout: float) -> Dict:
+    """
+    Runs one get_action call of a configuration on a position. Bots
+    report their search statistics through `nodes`, `search_depth` and
+    `depth_times` when they have them.
+    """
+    bot = get_benchmark_configs()[config](timeout=timeout)
+    state = position.get_state()
+
+    memory_before = peak_memory()
+    start = time()
+    action = bot.get_action(state)
+    elapsed = time() - start
+    memory_after = peak_memory()
+    if hasattr(bot, "close"):
+        bot.close()
+
+    nodes = getattr(bot, "nodes", 0)
+    return {
+        "config": config,
+        "position": position.name,
+        "phase": position.phase,
+        "number_of_dots": position.number_of_dots,
+        "action": None if action is None else [action.action_type, list(action.position)],
+        "elapsed": elapsed,
+        "nodes": nodes,
+        "nodes_per_second": nodes / elapsed if elapsed > 0 else 0.0,
+        # == False when the move was answered without search: forced, analyzer or tablebase
+        "searched": nodes > 0,
+        "depth": getattr(bot, "search_depth", None),
+        "time_to_depth": list(getattr(bot, "depth_times", [])),
+        "peak_memory": None if memory_before is None else memory_after - memory_before,
+    }
+
+
+def _measure_task(task: Tuple[str, BenchmarkPosition, float]) -> Dict:
+    return measure(*task)
+
+
+def run_benchmark(
+    configs: List[str],
+    positions: List[BenchmarkPosition],
+    timeout: float,
+    isolate: bool = True,
+) -> List[Dict]:
+    """
+    Measurements run one at a time. With isolate, every measurement runs
+    in a fresh process, so caches and peak memory do not leak between
+    them. Those processes are not daemons, so bots may start their own
+    worker processes.
+    """
+    tasks = [(config, position, timeout)
+             for config in configs for position in positions]
+    if not isolate:
+        return [_measure_task(task) for task in tasks]
+
+    with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as executor:
+        return list(executor.map(_measure_task, tasks))
+
+
+def is_searched(row: Dict) -> bool:
+    # == Results written before the "searched" field
+    return row.get("searched", row["nodes"] > 0)
+
+
+def summarize(results: List[Dict]) -> Dict[str, Dict]:
+    """
+    Nodes/second and mean depth only count the moves that were searched,
+    moves answered directly are reported by their count and time.
+    """
+    summary: Dict[str, Dict] = {}
+    for config in sorted({result["config"] for result in results}):
+        rows = [result for result in results if result["config"] == config]
+        searched = [row for row in rows if is_searched(row)]
+        direct = [row for row in rows if not is_searched(row)]
+        elapsed = sum(row["elapsed"] for row in searched)
+        depths = [row["depth"] for row in searched if row["depth"] is not None]
+        memories = [row["peak_memory"]
+                    for row in rows if row["peak_memory"] is not None]
+        summary[config] = {
+            "nodes": sum(row["nodes"] for row in searched),
+            "nodes_per_second": sum(row["nodes"] for row in searched) / elapsed if elapsed > 0 else 0.0,
+            "mean_depth": sum(depths) / len(depths) if depths else None,
+            "peak_memory": max(memories) if memories else None,
+            "direct_answers": len(direct),
+            "direct_answer_time": sum(row["elapsed"] for row in direct),
+        }
+    return summary
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """
+    Returns a description of every metric of `current` that is worse
+    than `baseline` by more than `threshold` (relative). Only the
+    (config, position) pairs measured by both runs are compared.
+    """
+    base_rows = {
+        (row["config"], row["position"]): row for row in baseline["results"]
+    }
+    pairs = [
+        (row, base_rows[(row["config"], row["position"])])
+        for row in current["results"]
+        if (row["config"], row["position"]) in base_rows
+    ]
+    now_summary = summarize([row for row, _ in pairs])
+    base_summary = summarize([base for _, base in pairs])
+
+    regressions = []
+    for config, base in base_summary.items():
+        now = now_summary[config]
+
+        if now["nodes_per_second"] < base["nodes_per_second"] * (1 - threshold):
+            regressions.append(
+                f"{config}: nodes/second {now['nodes_per_second']:.0f} < {base['nodes_per_second']:.0f}")
+
+        if base["mean_depth"] is not None and now["mean_depth"] is not None:
+            if now["mean_depth"] < base["mean_depth"] * (1 - threshold):
+                regressions.append(
+                    f"{config}: mean depth {now['mean_depth']:.2f} < {base['mean_depth']:.2f}")
+
+        if base["peak_memory"] is not None and now["peak_memory"] is not None:
+            if (
+                now["peak_memory"] > base["peak_memory"] * (1 + threshold)
+                and now["peak_memory"] - base["peak_memory"] > MEMORY_NOISE_BYTES
+            ):
+                regressions.append(
+                    f"{config}: peak memory {now['peak_memory']} > {base['peak_memory']}")
+
+        # == Time to reach the deepest depth completed by both runs
+        base_time = 0.0
+        now_time = 0.0
+        for row, base_row in pairs:
+            if row["config"] != config:
+                continue
+            depth = min(len(base_row["time_to_depth"]),
+                        len(row["time_to_depth"]))
+            if depth > 0:
+                base_time += base_row["time_to_depth"][depth - 1]
+                now_time += row["time_to_depth"][depth - 1]
+        if base_time > 0 and now_time > base_time * (1 + threshold):
+            regressions.append(
+                f"{config}: time to depth {now_time:.3f}s > {base_time:.3f}s")
+
+    return regressions
+
+
+if __name__ == "__main__":
+    configs = get_benchmark_configs()
+    parser = argparse.ArgumentParser(
+        description="Search performance benchmark on fixed positions")
+    parser.add_argument("--configs", nargs="+",
+                        choices=sorted(configs), default=sorted(configs))
+    parser.add_argument("--positions", nargs="+", default=None,
+                        help="only positions whose name or phase is listed")
+    parser.add_argument("--timeout", type=float, default=1.0,
+                        help="time budget of every move in seconds")
+    parser.add_argument("--output", default=None,
+                        help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=None,
+                        help="JSON file of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative slowdown reported as a regression")
+    parser.add_argument("--no-isolate", action="store_true",
+                        help="run every measurement in this process")
+    args = parser.parse_args()
+
+    positions = [
+        position for position in POSITIONS
+        if args.positions is None or position.name in args.positions or position.phase in args.positions
+    ]
+    results = run_benchmark(args.configs, positions,
+                            args.timeout, not args.no_isolate)
+    report = {
+        "timeout": args.timeout,
+        "results": results,
+        "summary": summarize(results),
+    }
+
+    for row in results:
+        if not is_searched(row):
+            print(f"{row['config']:<24} {row['position']:<20} answered directly in {row['elapsed']:.3f}s")
+            continue
+        print(
+            f"{row['config']:<24} {row['position']:<20} depth {str(row['depth']):>4}"
+            f"  {row['nodes_per_second']:>10.0f} nodes/s"
+        )
+    for config, summary in report["summary"].items():
+        print(f"{config}: {summary}")
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.threshold)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            sys.exit(1)
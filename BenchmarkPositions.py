@@ -0,0 +1,150 @@
+from typing import List, NamedTuple
+from GameAction import GameAction
+from GameEngine import GameEngine
+from GameState import GameState
+
+
+class BenchmarkPosition(NamedTuple):
+    """
+    name: unique name of the position
+    phase: "opening", "middlegame" or "endgame"
+    number_of_dots: board size, as in main.py
+    moves: moves played from the empty board, separated by spaces.
+        "r{x},{y}" marks row (x, y), "c{x},{y}" marks col (x, y).
+    """
+
+    name: str
+    phase: str
+    number_of_dots: int
+    moves: str
+
+    def get_actions(self) -> List[GameAction]:
+        actions = []
+        for move in self.moves.split():
+            x, y = move[1:].split(",")
+            action_type = "row" if move[0] == "r" else "col"
+            actions.append(GameAction(action_type, (int(x), int(y))))
+        return actions
+
+    def get_state(self) -> GameState:
+        engine = GameEngine(self.number_of_dots)
+        for action in self.get_actions():
+            engine.apply(action)
+        return engine.get_state()
+
+
+# == Openings and middlegames are random safe moves, endgames have no safe
+# move left, late endgames also have some chains already taken.
+POSITIONS: List[BenchmarkPosition] = [
+    BenchmarkPosition(
+        "4x4-opening",
+        "opening",
+        4,
+        (
+            "c1,0 r0,3 c2,2 c3,2"
+        ),
+    ),
+    BenchmarkPosition(
+        "4x4-middlegame",
+        "middlegame",
+        4,
+        (
+            "c2,0 c2,1 c1,1 c3,2 r1,0 r2,3 r0,0 r1,3 r0,3"
+        ),
+    ),
+    BenchmarkPosition(
+        "4x4-endgame",
+        "endgame",
+        4,
+        (
+            "c0,0 r2,0 c3,0 r1,3 c0,2 r1,2 r0,0 r1,0 r0,3 c3,2 c0,1 "
+            "r1,1 c3,1 r2,2"
+        ),
+    ),
+    BenchmarkPosition(
+        "4x4-late-endgame",
+        "endgame",
+        4,
+        (
+            "c0,0 r2,0 c3,0 r1,3 c0,2 r1,2 r0,0 r1,0 r0,3 c3,2 c0,1 "
+            "r1,1 c3,1 r2,2 r2,1 c2,1 c1,1 c2,0"
+        ),
+    ),
+    BenchmarkPosition(
+        "5x5-opening",
+        "opening",
+        5,
+        (
+            "r2,0 c0,3 c1,0 c4,1 r1,4 r0,0"
+        ),
+    ),
+    BenchmarkPosition(
+        "5x5-middlegame",
+        "middlegame",
+        5,
+        (
+            "c2,1 r0,2 r1,0 r2,0 c0,2 c4,0 c0,3 r1,3 r0,1 c2,3 r2,1 "
+            "c4,3 r3,2 r3,1 r2,4 c0,0"
+        ),
+    ),
+    BenchmarkPosition(
+        "5x5-endgame",
+        "endgame",
+        5,
+        (
+            "c3,1 c2,3 r0,2 r2,4 c1,2 c4,1 r1,1 r3,0 r2,2 r1,2 r2,0 "
+            "c4,2 r0,4 c3,2 r1,0 r1,4 c4,3 r0,0 c3,0 r3,4 c0,1 c0,0 "
+            "c0,3"
+        ),
+    ),
+    BenchmarkPosition(
+        "5x5-late-endgame",
+        "endgame",
+        5,
+        (
+            "c3,1 c2,3 r0,2 r2,4 c1,2 c4,1 r1,1 r3,0 r2,2 r1,2 r2,0 "
+            "c4,2 r0,4 c3,2 r1,0 r1,4 c4,3 r0,0 c3,0 r3,4 c0,1 c0,0 "
+            "c0,3 c4,0 r3,1 r3,2 r3,3 c3,3 r2,3 c2,2 r1,3 c1,3"
+        ),
+    ),
+    BenchmarkPosition(
+        "6x6-opening",
+        "opening",
+        6,
+        (
+            "c4,1 r3,2 c0,1 c5,3 c0,0 c4,0 r1,3 c1,3 r0,2 r2,2"
+        ),
+    ),
+    BenchmarkPosition(
+        "6x6-middlegame",
+        "middlegame",
+        6,
+        (
+            "c1,2 c4,2 r4,5 r4,4 r3,3 r0,1 r2,3 r0,4 c0,4 c3,3 c1,3 "
+            "r1,5 r2,2 c1,0 c2,4 c3,4 c5,1 r3,0 c5,3 r4,2 r3,1 r2,1 "
+            "r1,1 c0,1"
+        ),
+    ),
+    BenchmarkPosition(
+        "6x6-endgame",
+        "endgame",
+        6,
+        (
+            "c1,2 c4,4 r3,3 r2,2 r0,0 r0,2 r0,5 r2,0 c2,3 c5,3 c0,4 "
+            "r4,4 c0,1 r3,0 c4,1 r2,1 c5,0 r1,2 r3,5 c3,3 r4,2 r3,2 "
+            "r1,1 r2,5 c1,0 c2,4 c1,3 c4,0 c5,2 r1,5 c0,3"
+        ),
+    ),
+    BenchmarkPosition(
+        "6x6-late-endgame",
+        "endgame",
+        6,
+        (
+            "c1,2 c4,4 r3,3 r2,2 r0,0 r0,2 r0,5 r2,0 c2,3 c5,3 c0,4 "
+            "r4,4 c0,1 r3,0 c4,1 r2,1 c5,0 r1,2 r3,5 c3,3 r4,2 r3,2 "
+            "r1,1 r2,5 c1,0 c2,4 c1,3 c4,0 c5,2 r1,5 c0,3 c3,2 c4,2 "
+            "r4,3 c4,3 r3,4 c3,4 r2,4 r2,3 c2,2 r1,3 r1,4 c1,4 r0,4 "
+            "r0,3 c0,2 r3,1 c3,1"
+        ),
+    ),
+]
@@ -0,0 +1,243 @@
+from functools import lru_cache
+from typing import NamedTuple, Iterator, Tuple, Dict, List
+from GameAction import GameAction
+from GameState import GameState
+import numpy as np
+
+
+class BoardLayout:
+    """
+    Precomputed geometry of a board with `rows` x `cols` boxes.
+
+    Edges are numbered as bits of a Python int. Horizontal lines come
+    first, followed by the vertical ones:
+        row (x, y) -> y * cols + x
+        col (x, y) -> (rows + 1) * cols + y * (cols + 1) + x
+
+    Boxes are numbered in raster order: box (x, y) -> y * cols + x.
+
+    Use BoardLayout.get(rows, cols) to obtain a shared instance.
+    """
+
+    def __init__(self, rows: int, cols: int):
+        self.rows = rows
+        self.cols = cols
+        self.num_row_edges = (rows + 1) * cols
+        self.num_edges = self.num_row_edges + rows * (cols + 1)
+        self.num_boxes = rows * cols
+        self.full_edges = (1 << self.num_edges) - 1
+        self.full_boxes = (1 << self.num_boxes) - 1
+
+        # == Edge <-> action mapping
+        actions = []
+        for y in range(rows + 1):
+            for x in range(cols):
+                actions.append(GameAction("row", (x, y)))
+        for y in range(rows):
+            for x in range(cols + 1):
+                actions.append(GameAction("col", (x, y)))
+        self.edge_actions: Tuple[GameAction, ...] = tuple(actions)
+        self.action_edges: Dict[GameAction, int] = {
+            action: edge for edge, action in enumerate(actions)
+        }
+
+        # == Box -> edges (top, bottom, left, right) and edge -> boxes
+        box_edges = []
+        edge_boxes = [[] for _ in range(self.num_edges)]
+        for y in range(rows):
+            for x in range(cols):
+                box = y * cols + x
+                edges = (
+                    self.row_edge(x, y),
+                    self.row_edge(x, y + 1),
+                    self.col_edge(x, y),
+                    self.col_edge(x + 1, y),
+                )
+                box_edges.append(edges)
+                for edge in edges:
+                    edge_boxes[edge].append(box)
+
+        self.box_edges: Tuple[Tuple[int, int, int, int], ...] = tuple(
+            box_edges)
+        self.box_masks: Tuple[int, ...] = tuple(
+            sum(1 << edge for edge in edges) for edges in box_edges
+        )
+        self.edge_boxes: Tuple[Tuple[int, ...], ...] = tuple(
+            tuple(boxes) for boxes in edge_boxes
+        )
+
+        # == Box -> (neighbor box, shared edge)
+        box_neighbors = []
+        for y in range(rows):
+            for x in range(cols):
+                box = y * cols + x
+                neighbors = []
+                if x > 0:
+                    neighbors.append((box - 1, self.col_edge(x, y)))
+                if y > 0:
+                    neighbors.append((box - cols, self.row_edge(x, y)))
+                if x < cols - 1:
+                    neighbors.append((box + 1, self.col_edge(x + 1, y)))
+                if y < rows - 1:
+                    neighbors.append((box + cols, self.row_edge(x, y + 1)))
+                box_neighbors.append(tuple(neighbors))
+        self.box_neighbors: Tuple[Tuple[Tuple[int, int], ...], ...] = tuple(
+            box_neighbors)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get(rows: int, cols: int) -> "BoardLayout":
+        return BoardLayout(rows, cols)
+
+    # == Unpickle to the shared instance, so caches keyed by layout keep working across processes
+    def __reduce__(self):
+        return BoardLayout.get, (self.rows, self.cols)
+
+    def row_edge(self, x: int, y: int) -> int:
+        return y * self.cols + x
+
+    def col_edge(self, x: int, y: int) -> int:
+        return self.num_row_edges + y * (self.cols + 1) + x
+
+    def edge_of(self, action: GameAction) -> int:
+        return self.action_edges[GameAction(action.action_type, tuple(action.position))]
+
+
+class BitBoard(NamedTuple):
+    """
+    Compact immutable game position.
+
+    edges: int
+        Bit i is set if edge i (see BoardLayout) has been marked.
+
+    player1_boxes, player2_boxes: int
+        Bit b is set if box b has been taken by that player.
+
+    player1_turn: bool
+        True if it is player 1 turn, False for player 2.
+
+    layout: BoardLayout
+        Shared precomputed geometry of the board.
+    """
+
+    edges: int
+    player1_boxes: int
+    player2_boxes: int
+    player1_turn: bool
+    layout: BoardLayout
+
+    # == Conversion from / to GameState
+    @staticmethod
+    def from_state(state: GameState) -> "BitBoard":
+        [rows, cols] = state.board_status.shape
+        layout = BoardLayout.get(rows, cols)
+
+        edges = 0
+        for edge, action in enumerate(layout.edge_actions):
+            x, y = action.position
+            matrix = state.row_status if action.action_type == "row" else state.col_status
+            if matrix[y, x] != 0:
+                edges |= 1 << edge
+
+        player1_boxes = 0
+        player2_boxes = 0
+        for box, value in enumerate(state.board_status.flat):
+            if value == -4:
+                player1_boxes |= 1 << box
+            elif value == 4:
+                player2_boxes |= 1 << box
+
+        return BitBoard(edges, player1_boxes, player2_boxes, bool(state.player1_turn), layout)
+
+    def to_state(self) -> GameState:
+        """
+        Only completed boxes carry a sign in the resulting board_status,
+        the remaining cells hold the (positive) number of marked edges.
+        """
+        layout = self.layout
+        board_status = np.zeros(shape=(layout.rows, layout.cols))
+        row_status = np.zeros(shape=(layout.rows + 1, layout.cols))
+        col_status = np.zeros(shape=(layout.rows, layout.cols + 1))
+
+        for edge in iterate_bits(self.edges):
+            action = layout.edge_actions[edge]
+            x, y = action.position
+            if action.action_type == "row":
+                row_status[y, x] = 1
+            else:
+                col_status[y, x] = 1
+
+        for box, mask in enumerate(layout.box_masks):
+            value = (self.edges & mask).bit_count()
+            if self.player1_boxes >> box & 1:
+                value = -value
+            board_status[box // layout.cols, box % layout.cols] = value
+
+        return GameState(board_status, row_status, col_status, self.player1_turn)
+
+    # == Move application
+    def get_result(self, edge: int) -> "BitBoard":
+        layout = self.layout
+        edges = self.edges | (1 << edge)
+
+        scored = 0
+        for box in layout.edge_boxes[edge]:
+            mask = layout.box_masks[box]
+            if edges & mask == mask:
+                scored |= 1 << box
+
+        if not scored:
+            return BitBoard(edges, self.player1_boxes, self.player2_boxes, not self.player1_turn, layout)
+        if self.player1_turn:
+            return BitBoard(edges, self.player1_boxes | scored, self.player2_boxes, True, layout)
+        return BitBoard(edges, self.player1_boxes, self.player2_boxes | scored, False, layout)
+
+    def play(self, action: GameAction) -> "BitBoard":
+        return self.get_result(self.layout.edge_of(action))
+
+    # == Queries
+    def free_edges(self) -> int:
+        return self.layout.full_edges & ~self.edges
+
+    def legal_edges(self) -> Iterator[int]:
+        return iterate_bits(self.free_edges())
+
+    def is_terminal(self) -> bool:
+        return self.edges == self.layout.full_edges
+
+    def box_side_count(self, box: int) -> int:
+        return (self.edges & self.layout.box_masks[box]).bit_count()
+
+
+def iterate_bits(mask: int) -> Iterator[int]:
+    # == Yield the index of every set bit, lowest first
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def build_chunk_tables(images: List[int], chunk_bits: int = 8) -> List[List[int]]:
+    """
+    Precompute lookup tables for a bitwise linear map, where images[i] is
+    the value that bit i maps to. The map of a whole mask is then the xor
+    of one lookup per chunk of `chunk_bits` bits (see apply_chunk_tables).
+    """
+    tables = []
+    for start in range(0, len(images), chunk_bits):
+        chunk = images[start:start + chunk_bits]
+        table = [0] * (1 << len(chunk))
+        for value in range(1, len(table)):
+            low = value & -value
+            table[value] = table[value ^ low] ^ chunk[low.bit_length() - 1]
+        tables.append(table)
+    return tables
+
+
+def apply_chunk_tables(tables: List[List[int]], mask: int, chunk_bits: int = 8) -> int:
+    result = 0
+    chunk_mask = (1 << chunk_bits) - 1
+    for table in tables:
+        result ^= table[mask & chunk_mask]
+        mask >>= chunk_bits
+    return result
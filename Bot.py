@@ -12,3 +12,20 @@ class Bot:
         Returns action based on state.
         """
         raise NotImplementedError()
+
+    def ponder(self, state: GameState):
+        """
+        Called when the opponent is to move in state. Bots may keep
+        thinking in the background until stop_pondering or get_action.
+        """
+
+    def stop_pondering(self):
+        """
+        Stops thinking started by ponder.
+        """
+
+    def cancel(self):
+        """
+        Makes a get_action running in another thread return as soon as
+        possible. Its action is not used.
+        """
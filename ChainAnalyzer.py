@@ -0,0 +1,230 @@
+from functools import lru_cache
+from typing import List, NamedTuple, Tuple
+from BitBoard import BoardLayout
+from SearchPosition import Position
+
+GROUND = "ground"
+JOINT = "joint"
+OPEN = "open"
+
+
+class Chain(NamedTuple):
+    """
+    A maximal run of untaken boxes with at most two free sides each.
+
+    length: number of boxes
+    is_loop: True for a closed cycle, which has no ends
+    ends: for a chain, what lies beyond each of its two ends:
+        GROUND: a free edge on the border of the board
+        JOINT: a box with three or more free sides
+        OPEN: nothing, the end box has three sides and can be taken now
+    boxes: bitmask of the boxes
+    """
+
+    length: int
+    is_loop: bool
+    ends: Tuple[str, ...]
+    boxes: int
+
+    @property
+    def open_ends(self) -> int:
+        return self.ends.count(OPEN)
+
+    @property
+    def closed_ends(self) -> int:
+        return len(self.ends) - self.open_ends
+
+
+class ChainAnalysis(NamedTuple):
+    """
+    region_sizes: sizes of the connected regions of untaken boxes, two
+        boxes being connected while the edge between them is unmarked
+    chains: Chain of every path of boxes with at most two free sides
+    loops: Chain of every cycle of such boxes
+    """
+
+    region_sizes: List[int]
+    chains: List[Chain]
+    loops: List[Chain]
+
+    def chain_lengths(self) -> List[int]:
+        return [chain.length for chain in self.chains]
+
+    def loop_lengths(self) -> List[int]:
+        return [loop.length for loop in self.loops]
+
+
+class ChainAnalyzer:
+    """
+    Linear-time chain and loop analysis for any board size, by iterative
+    flood fill over precomputed box adjacency. Use ChainAnalyzer.get(layout)
+    to obtain a shared instance.
+    """
+
+    def __init__(self, layout: BoardLayout):
+        self.layout = layout
+        self.box_masks = layout.box_masks
+        self.box_neighbors = layout.box_neighbors
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get(layout: BoardLayout) -> "ChainAnalyzer":
+        return ChainAnalyzer(layout)
+
+    def region_sizes(self, position: Position) -> List[int]:
+        edges = position.edges
+        box_masks = self.box_masks
+        box_neighbors = self.box_neighbors
+
+        seen = 0
+        sizes = []
+        for start, mask in enumerate(box_masks):
+            if seen >> start & 1 or edges & mask == mask:
+                continue
+
+            seen |= 1 << start
+            stack = [start]
+            size = 0
+            while stack:
+                box = stack.pop()
+                size += 1
+                for neighbor, shared_edge in box_neighbors[box]:
+                    if not (edges >> shared_edge | seen >> neighbor) & 1:
+                        seen |= 1 << neighbor
+                        stack.append(neighbor)
+            sizes.append(size)
+        return sizes
+
+    def count_long_regions(self, position: Position, min_length: int = 3) -> int:
+        return sum(1 for size in self.region_sizes(position) if size >= min_length)
+
+    def analyze(self, position: Position) -> ChainAnalysis:
+        edges = position.edges
+        box_masks = self.box_masks
+        box_neighbors = self.box_neighbors
+
+        # == Free sides of every box, taken boxes have none
+        valences = [4 - (edges & mask).bit_count() for mask in box_masks]
+
+        # == Neighbors of every chain box (at most two free sides) that are chain boxes too
+        chain_neighbors: List[List[int]] = [[] for _ in box_masks]
+        joint_sides = [0] * len(box_masks)
+        for box, valence in enumerate(valences):
+            if valence == 0 or valence > 2:
+                continue
+            for neighbor, shared_edge in box_neighbors[box]:
+                if edges >> shared_edge & 1:
+                    continue
+                if valences[neighbor] <= 2:
+                    chain_neighbors[box].append(neighbor)
+                else:
+                    joint_sides[box] += 1
+
+        chains = []
+        seen = 0
+        for box, valence in enumerate(valences):
+            if seen >> box & 1 or valence == 0 or valence > 2 or len(chain_neighbors[box]) == 2:
+                continue
+
+            # Walk the path from one end to the other
+            path = [box]
+            seen |= 1 << box
+            previous, current = -1, box
+            while True:
+                following = [
+                    neighbor for neighbor in chain_neighbors[current] if neighbor != previous]
+                if not following:
+                    break
+                previous, current = current, following[0]
+                seen |= 1 << current
+                path.append(current)
+
+            ends = self.path_ends(
+                path[0], valences, chain_neighbors, joint_sides)
+            if len(path) > 1:
+                ends += self.path_ends(path[-1], valences,
+                                       chain_neighbors, joint_sides)
+            chains.append(Chain(len(path), False, ends, sum(1 << b for b in path)))
+
+        # == Chain boxes left over all have two chain neighbors, they form loops
+        loops = []
+        for box, valence in enumerate(valences):
+            if seen >> box & 1 or valence != 2:
+                continue
+
+            length = 0
+            boxes = 0
+            previous, current = -1, box
+            while not seen >> current & 1:
+                seen |= 1 << current
+                boxes |= 1 << current
+                length += 1
+                first, second = chain_neighbors[current]
+                previous, current = current, second if first == previous else first
+            loops.append(Chain(length, True, (), boxes))
+
+        return ChainAnalysis(self.region_sizes(position), chains, loops)
+
+    def capture_sequences(self, position: Position) -> Tuple[List[int], List[List[int]]]:
+        """
+        Compound moves of a position with capturable boxes.
+
+        Returns the edges taking every box that can be taken in a row, and
+        the sequences taking all of them except the last two boxes of a
+        run (the last four of a run open at both ends) and then marking
+        the double-dealing edge, which hands those boxes out in dominoes
+        and ends the turn.
+        """
+        box_masks = self.box_masks
+        edge_boxes = self.layout.edge_boxes
+
+        # == Take every capturable box, one run at a time
+        edges = position.edges
+        runs: List[List[int]] = []
+        while True:
+            box = next((box for box, mask in enumerate(box_masks)
+                        if (edges & mask).bit_count() == 3), None)
+            if box is None:
+                break
+            run = []
+            while box is not None:
+                edge = (box_masks[box] & ~edges).bit_length() - 1
+                edges |= 1 << edge
+                run.append(edge)
+                box = None
+                for other in edge_boxes[edge]:
+                    if (edges & box_masks[other]).bit_count() == 3:
+                        box = other
+            runs.append(run)
+        take_all = [edge for run in runs for edge in run]
+
+        # == Runs are independent, the others are taken in full
+        declines = []
+        for index, run in enumerate(runs):
+            others = [edge for other in runs[:index] + runs[index + 1:] for edge in other]
+            for kept, prefix, deal in ((2, run[:-2], run[-1:]), (4, run[:-3], run[-2:-1])):
+                if len(run) < kept - 1 or not deal:
+                    continue
+                sequence = others + prefix + deal
+                if self.is_double_deal(position.edges, sequence, kept):
+                    declines.append(sequence)
+        return take_all, declines
+
+    def is_double_deal(self, edges: int, sequence: List[int], kept: int) -> bool:
+        # == Every edge but the last completes a box, the last leaves exactly `kept` capturable boxes
+        box_masks = self.box_masks
+        edge_boxes = self.layout.edge_boxes
+        for index, edge in enumerate(sequence):
+            edges |= 1 << edge
+            completed = any(edges & box_masks[box] == box_masks[box]
+                            for box in edge_boxes[edge])
+            if completed == (index == len(sequence) - 1):
+                return False
+        return sum(1 for mask in box_masks if (edges & mask).bit_count() == 3) == kept
+
+    def path_ends(self, box: int, valences: List[int], chain_neighbors: List[List[int]], joint_sides: List[int]) -> Tuple[str, ...]:
+        # == Ends contributed by an end box: its free sides leaving the chain, or OPEN
+        ground = valences[box] - len(chain_neighbors[box]) - joint_sides[box]
+        slots = 2 - len(chain_neighbors[box])
+        ends = (GROUND,) * ground + (JOINT,) * joint_sides[box]
+        return ends + (OPEN,) * (slots - len(ends))
@@ -0,0 +1,128 @@
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+from BitBoard import BitBoard, BoardLayout
+from ChainAnalyzer import ChainAnalyzer
+from SearchPosition import Position
+
+
+@lru_cache(maxsize=None)
+def solve_components(chains: Tuple[int, ...], loops: Tuple[int, ...]) -> int:
+    """
+    Margin the player to move gets from independent chains and loops
+    (sorted lengths) when every move opens one of them.
+
+    The opponent either takes the opened component and moves next, or
+    keeps control by taking all but the last two boxes of a chain (four
+    of a loop) and handing those back. Chains of one or two boxes are
+    opened so that they cannot be declined.
+    """
+    best = None
+    for components, others, decline_cost in ((chains, loops, 4), (loops, chains, 8)):
+        for index, length in enumerate(components):
+            if index and components[index - 1] == length:
+                continue
+            rest = components[:index] + components[index + 1:]
+            if components is chains:
+                rest_value = solve_components(rest, others)
+            else:
+                rest_value = solve_components(others, rest)
+
+            opponent = length + rest_value
+            if length >= 3:
+                opponent = max(opponent, length - decline_cost - rest_value)
+            if best is None or -opponent > best:
+                best = -opponent
+    return best if best is not None else 0
+
+
+class EndgameAnalyzer:
+    """
+    Exact values of simple endgames without tree search.
+
+    A simple endgame has no safe move left and every untaken box has
+    exactly two free sides, so the board falls apart into independent
+    chains and loops, solved by solve_components. Capturable boxes are
+    resolved first over the compound moves of ChainAnalyzer. Values are
+    margins of the player to move, as in PerfectPlayDatabase, and None
+    outside simple endgames. Use EndgameAnalyzer.get(layout) to obtain a
+    shared instance.
+    """
+
+    def __init__(self, layout: BoardLayout):
+        self.layout = layout
+        self.chain_analyzer = ChainAnalyzer.get(layout)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get(layout: BoardLayout) -> "EndgameAnalyzer":
+        return EndgameAnalyzer(layout)
+
+    def components(self, edges: int) -> Optional[Tuple[Tuple[int, ...], Tuple[int, ...]]]:
+        # == Sorted chain and loop lengths, None unless every untaken box has two free sides
+        for mask in self.layout.box_masks:
+            count = (edges & mask).bit_count()
+            if count != 2 and count != 4:
+                return None
+        analysis = self.chain_analyzer.analyze(self.to_board(edges))
+        return tuple(sorted(analysis.chain_lengths())), tuple(sorted(analysis.loop_lengths()))
+
+    def value(self, position: Position) -> Optional[int]:
+        """
+        Margin the player to move still gets with perfect play, or None
+        if the position is not a simple endgame.
+        """
+        return self.edge_value(position.edges)
+
+    def edge_value(self, edges: int) -> Optional[int]:
+        box_masks = self.layout.box_masks
+        if not any((edges & mask).bit_count() == 3 for mask in box_masks):
+            components = self.components(edges)
+            if components is None:
+                return None
+            return solve_components(*components)
+
+        # == Take everything, or decline the last boxes and keep control
+        take_all, declines = self.chain_analyzer.capture_sequences(
+            self.to_board(edges))
+        taken = self.count_boxes(edges)
+        best = None
+        for index, sequence in enumerate([take_all] + declines):
+            child_edges = edges
+            for edge in sequence:
+                child_edges |= 1 << edge
+            child = self.edge_value(child_edges)
+            if child is None:
+                return None
+            captured = self.count_boxes(child_edges) - taken
+            value = captured + child if index == 0 else captured - child
+            if best is None or value > best:
+                best = value
+        return best
+
+    def move_values(self, position: Position) -> Optional[Dict[int, int]]:
+        """
+        Margin the player to move gets from now on by marking each free
+        edge and playing perfectly afterwards, or None if a position after
+        one of them is not a simple endgame.
+        """
+        layout = self.layout
+        move_values = {}
+        for edge in position.legal_edges():
+            edges = position.edges | 1 << edge
+            captured = 0
+            for box in layout.edge_boxes[edge]:
+                mask = layout.box_masks[box]
+                if edges & mask == mask:
+                    captured += 1
+            child = self.edge_value(edges)
+            if child is None:
+                return None
+            move_values[edge] = captured + child if captured else -child
+        return move_values
+
+    def count_boxes(self, edges: int) -> int:
+        return sum(1 for mask in self.layout.box_masks if edges & mask == mask)
+
+    # == Only the marked edges matter to the analysis
+    def to_board(self, edges: int) -> BitBoard:
+        return BitBoard(edges, 0, 0, True, self.layout)
@@ -0,0 +1,204 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from math import comb
+from typing import List, Optional, Tuple
+from BitBoard import BoardLayout, iterate_bits
+from PerfectPlayDatabase import DATA_DIRECTORY
+from SearchPosition import Position
+import argparse
+import os
+import numpy as np
+
+# == Free edge sets are packed in int64 masks
+MAX_EDGES = 63
+
+# == Parent positions solved per task
+CHUNK_SIZE = 1 << 18
+
+
+def get_default_path(layout: BoardLayout) -> str:
+    return os.path.join(DATA_DIRECTORY, f"endgame_{layout.rows}x{layout.cols}.npy")
+
+
+def layer_offsets(num_edges: int, max_free: int) -> List[int]:
+    # == Index of the first position with f free edges, for f = 0 .. max_free + 1
+    offsets = [0]
+    for free in range(max_free + 1):
+        offsets.append(offsets[-1] + comb(num_edges, free))
+    return offsets
+
+
+class EndgameTablebase:
+    """
+    Exact values of every position with at most max_free free edges.
+
+    As in PerfectPlayDatabase, the value is the margin the player to move
+    still gets with perfect play, which only depends on the marked edges.
+    Positions with f free edges are stored in layer f, ranked by their set
+    of free edges {c_1 < ... < c_f} in the combinatorial number system:
+        index = offsets[f] + C(c_1, 1) + C(c_2, 2) + ... + C(c_f, f)
+    The layers are generated from the full board upwards, the positions of
+    a layer in parallel chunks, straight into a memory-mapped .npy file.
+    Use EndgameTablebase.get(layout) to load the default file once.
+    """
+
+    def __init__(self, layout: BoardLayout, max_free: int, values: np.ndarray):
+        self.layout = layout
+        self.max_free = max_free
+        self.values = values
+        self.offsets = layer_offsets(layout.num_edges, max_free)
+        self.binomials = [
+            [comb(c, i) for i in range(max_free + 1)] for c in range(layout.num_edges)
+        ]
+
+        # == Statistics
+        self.hits = 0
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get(layout: BoardLayout) -> Optional["EndgameTablebase"]:
+        try:
+            return EndgameTablebase.load(layout)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def load(layout: BoardLayout, path: Optional[str] = None) -> "EndgameTablebase":
+        if path is None:
+            path = get_default_path(layout)
+        values = np.load(path, mmap_mode="r")
+
+        # The number of layers follows from the size of the file
+        offsets = layer_offsets(layout.num_edges, layout.num_edges)
+        if values.ndim != 1 or len(values) not in offsets[2:]:
+            raise ValueError(
+                f"{path} does not hold a {layout.rows}x{layout.cols} tablebase")
+        return EndgameTablebase(layout, offsets.index(len(values)) - 1, values)
+
+    @staticmethod
+    def generate(
+        layout: BoardLayout,
+        max_free: int,
+        path: Optional[str] = None,
+        workers: Optional[int] = None,
+    ) -> "EndgameTablebase":
+        if layout.num_edges > MAX_EDGES:
+            raise ValueError(
+                f"{layout.rows}x{layout.cols} boxes have {layout.num_edges} edges, at most {MAX_EDGES} are supported")
+        if path is None:
+            path = get_default_path(layout)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        offsets = layer_offsets(layout.num_edges, max_free)
+        values = np.lib.format.open_memmap(
+            path, mode="w+", dtype=np.int8, shape=(offsets[-1],))
+        values[0] = 0
+        values.flush()
+        del values
+
+        # == Layer f only needs layer f - 1, its chunks are independent
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for free in range(1, max_free + 1):
+                size = comb(layout.num_edges, free)
+                tasks = [
+                    (layout, max_free, path, free, start,
+                     min(start + CHUNK_SIZE, size))
+                    for start in range(0, size, CHUNK_SIZE)
+                ]
+                list(executor.map(_solve_chunk_task, tasks))
+
+        return EndgameTablebase.load(layout, path)
+
+    # == Probing
+    def index(self, free_edges: int) -> int:
+        binomials = self.binomials
+        rank = 0
+        i = 0
+        for edge in iterate_bits(free_edges):
+            i += 1
+            rank += binomials[edge][i]
+        return self.offsets[i] + rank
+
+    def probe(self, board: Position) -> Optional[int]:
+        """
+        Margin the player to move still gets with perfect play, or None
+        if the position has more than max_free free edges.
+        """
+        free_edges = board.layout.full_edges & ~board.edges
+        if free_edges.bit_count() > self.max_free:
+            return None
+        self.hits += 1
+        return int(self.values[self.index(free_edges)])
+
+
+def _solve_chunk_task(task: Tuple[BoardLayout, int, str, int, int, int]):
+    layout, max_free, path, free, start, end = task
+    values = np.load(path, mmap_mode="r+")
+    offsets = layer_offsets(layout.num_edges, max_free)
+    values[offsets[free] + start:offsets[free] + end] = solve_chunk(
+        layout, values[offsets[free - 1]:offsets[free]], free, start, end)
+    values.flush()
+
+
+def solve_chunk(layout: BoardLayout, children: np.ndarray, free: int, start: int, end: int) -> np.ndarray:
+    """
+    Values of the positions of rank start .. end - 1 with `free` free
+    edges, from the values of the positions with one free edge less.
+    """
+    num_edges = layout.num_edges
+    binomials = np.array([[comb(c, i) for i in range(free + 2)]
+                         for c in range(num_edges)], dtype=np.int64)
+
+    # == Unrank: free edges of every position, column i holds c_(i+1)
+    ranks = np.arange(start, end, dtype=np.int64)
+    free_positions = np.zeros((end - start, free), dtype=np.int64)
+    for i in range(free, 0, -1):
+        edge = np.searchsorted(binomials[:, i], ranks, side="right") - 1
+        free_positions[:, i - 1] = edge
+        ranks -= binomials[edge, i]
+    free_masks = np.bitwise_or.reduce(
+        np.left_shift(np.int64(1), free_positions), axis=1)
+
+    # == Rank of the child without c_(j+1): the edges above it move one place down
+    own_terms = binomials[free_positions, np.arange(1, free + 1)]
+    lower_terms = binomials[free_positions, np.arange(0, free)]
+    before = np.cumsum(own_terms, axis=1) - own_terms
+    after = np.cumsum(lower_terms[:, ::-1], axis=1)[:, ::-1] - lower_terms
+
+    # == Other three sides of each box of an edge, and whether the box exists
+    others = np.zeros((2, num_edges), dtype=np.int64)
+    exists = np.zeros((2, num_edges), dtype=bool)
+    for edge in range(num_edges):
+        for slot, box in enumerate(layout.edge_boxes[edge]):
+            others[slot, edge] = layout.box_masks[box] & ~(1 << edge)
+            exists[slot, edge] = True
+
+    best = np.full(end - start, -128, dtype=np.int8)
+    for j in range(free):
+        edge = free_positions[:, j]
+        child = children[before[:, j] + after[:, j]]
+
+        # The player keeps the turn after completing a box
+        captured = np.zeros(end - start, dtype=np.int8)
+        for slot in range(2):
+            captured += exists[slot, edge] & (
+                (free_masks & others[slot, edge]) == 0)
+        value = np.where(captured > 0, captured + child, -child)
+        best = np.maximum(best, value)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate the endgame tablebase of a board")
+    parser.add_argument("--dots", type=int, default=5)
+    parser.add_argument("--max-free", type=int, default=6,
+                        help="largest number of free edges of the stored positions")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    layout = BoardLayout.get(args.dots - 1, args.dots - 1)
+    tablebase = EndgameTablebase.generate(
+        layout, args.max_free, args.output, args.workers)
+    print(f"{len(tablebase.values)} positions with at most {tablebase.max_free} free edges")
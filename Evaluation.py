@@ -0,0 +1,159 @@
+from functools import lru_cache
+from typing import Sequence
+from BitBoard import BitBoard, BoardLayout
+from GameState import GameState
+from SearchPosition import Position
+import numpy as np
+
+
+class BatchEvaluator:
+    """
+    Scores a stack of positions of one board layout with NumPy.
+
+    Positions are turned into an (N, num_edges) matrix of marked edges;
+    side counts, box owners and the connected regions used by the chain
+    rule are then computed for the whole stack at once. Use
+    BatchEvaluator.get(layout) to obtain a shared instance.
+    """
+
+    def __init__(self, layout: BoardLayout):
+        self.layout = layout
+        self.num_bytes = (layout.num_edges + 7) // 8
+
+        # == (num_edges, num_boxes) incidence matrix, side counts are E @ incidence
+        incidence = np.zeros((layout.num_edges, layout.num_boxes), dtype=np.int16)
+        for box, edges in enumerate(layout.box_edges):
+            incidence[list(edges), box] = 1
+        self.incidence = incidence
+
+        # == For each of the four directions: neighbor box and shared edge, or -1
+        neighbors = -np.ones((4, layout.num_boxes), dtype=np.intp)
+        shared_edges = np.zeros((4, layout.num_boxes), dtype=np.intp)
+        for box, box_neighbors in enumerate(layout.box_neighbors):
+            for direction, (neighbor, shared_edge) in enumerate(box_neighbors):
+                neighbors[direction, box] = neighbor
+                shared_edges[direction, box] = shared_edge
+        self.neighbors = neighbors
+        self.shared_edges = shared_edges
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get(layout: BoardLayout) -> "BatchEvaluator":
+        return BatchEvaluator(layout)
+
+    # == Conversion of a stack of positions
+    def edge_matrix(self, edges: Sequence[int]) -> np.ndarray:
+        num_bytes = self.num_bytes
+        buffer = b"".join(value.to_bytes(num_bytes, "little")
+                          for value in edges)
+        bits = np.unpackbits(np.frombuffer(buffer, dtype=np.uint8).reshape(
+            len(edges), num_bytes), axis=1, bitorder="little")
+        return bits[:, :self.layout.num_edges]
+
+    def box_matrix(self, boxes: Sequence[int]) -> np.ndarray:
+        num_bytes = (self.layout.num_boxes + 7) // 8
+        buffer = b"".join(value.to_bytes(num_bytes, "little")
+                          for value in boxes)
+        bits = np.unpackbits(np.frombuffer(buffer, dtype=np.uint8).reshape(
+            len(boxes), num_bytes), axis=1, bitorder="little")
+        return bits[:, :self.layout.num_boxes]
+
+    # == Vectorized features
+    def side_counts(self, edge_matrix: np.ndarray) -> np.ndarray:
+        return edge_matrix.astype(np.int16) @ self.incidence
+
+    def long_region_counts(self, edge_matrix: np.ndarray, min_length: int = 3) -> np.ndarray:
+        """
+        Number of connected regions of untaken boxes with at least
+        min_length boxes, by label propagation over all positions at once.
+        """
+        count, num_boxes = len(edge_matrix), self.layout.num_boxes
+        labels = np.broadcast_to(
+            np.arange(num_boxes), (count, num_boxes)).copy()
+
+        # A box is joined to a neighbor while their shared edge is unmarked
+        joined = []
+        for direction in range(4):
+            valid = self.neighbors[direction] >= 0
+            is_open = (edge_matrix[:, self.shared_edges[direction]] == 0) & valid
+            joined.append((is_open, np.where(valid, self.neighbors[direction], 0)))
+
+        while True:
+            updated = labels
+            for is_open, neighbor in joined:
+                updated = np.minimum(updated, np.where(
+                    is_open, labels[:, neighbor], num_boxes))
+            if np.array_equal(updated, labels):
+                break
+            labels = updated
+
+        offsets = (np.arange(count) * num_boxes)[:, None]
+        sizes = np.bincount((labels + offsets).ravel(),
+                            minlength=count * num_boxes).reshape(count, num_boxes)
+        return np.count_nonzero(sizes >= min_length, axis=1)
+
+    def evaluate(
+        self,
+        edges: Sequence[int],
+        player1_boxes: Sequence[int],
+        player2_boxes: Sequence[int],
+        is_player1: bool,
+        three_sided_as_lost: bool = False,
+    ) -> np.ndarray:
+        """
+        Same utility as AdversarialSearchBot.get_utility, or as
+        LocalSearchBot.get_value when three_sided_as_lost, for every
+        position of the stack.
+        """
+        edge_matrix = self.edge_matrix(edges)
+        player1_won = self.box_matrix(player1_boxes).sum(axis=1, dtype=np.int64)
+        player2_won = self.box_matrix(player2_boxes).sum(axis=1, dtype=np.int64)
+
+        if is_player1:
+            box_won, box_lost = player1_won, player2_won
+        else:
+            box_won, box_lost = player2_won, player1_won
+        if three_sided_as_lost:
+            box_lost = box_lost + \
+                np.count_nonzero(self.side_counts(edge_matrix) == 3, axis=1)
+
+        utility = (box_won - box_lost).astype(float)
+
+        # == Chain rule
+        is_even = self.long_region_counts(edge_matrix) % 2 == 0
+        utility += is_even if is_player1 else ~is_even
+
+        # == Win/Lose Heuristics
+        num_boxes = self.layout.num_boxes
+        utility[2 * box_lost > num_boxes] = -np.inf
+        utility[2 * box_won > num_boxes] = np.inf
+        return utility
+
+
+def evaluate_many(
+    positions: Sequence[Position],
+    is_player1: bool,
+    three_sided_as_lost: bool = False,
+) -> np.ndarray:
+    """
+    Scores a stack of BitBoard / SearchPosition of the same board layout
+    in one batch, see BatchEvaluator.evaluate.
+    """
+    if not positions:
+        return np.zeros(0)
+    evaluator = BatchEvaluator.get(positions[0].layout)
+    return evaluator.evaluate(
+        [position.edges for position in positions],
+        [position.player1_boxes for position in positions],
+        [position.player2_boxes for position in positions],
+        is_player1,
+        three_sided_as_lost,
+    )
+
+
+def evaluate_states(
+    states: Sequence[GameState],
+    is_player1: bool,
+    three_sided_as_lost: bool = False,
+) -> np.ndarray:
+    return evaluate_many([BitBoard.from_state(state) for state in states], is_player1, three_sided_as_lost)
@@ -0,0 +1,58 @@
+from typing import Iterator, List
+from BitBoard import BoardLayout, iterate_bits
+import random
+
+
+class FreeEdgeIndex:
+    """
+    Set of the free edges of a position, updated as edges are marked.
+
+    A sparse set: `edges` holds every edge of the board with the free ones
+    in front, edges[:size], and `slots` maps an edge to its index in
+    `edges`. Marking an edge swaps it with the last free one, unmarking
+    swaps it back into the free part, so both are O(1), as are uniform
+    sampling and membership tests; enumeration is O(k) for k free edges.
+    The order of the free edges changes with every update.
+    """
+
+    def __init__(self, layout: BoardLayout, marked: int = 0):
+        free = list(iterate_bits(layout.full_edges & ~marked))
+        self.edges: List[int] = free + list(iterate_bits(marked))
+        self.slots: List[int] = [0] * layout.num_edges
+        for slot, edge in enumerate(self.edges):
+            self.slots[edge] = slot
+        self.size = len(free)
+
+    def remove(self, edge: int):
+        edges = self.edges
+        slots = self.slots
+        slot = slots[edge]
+        self.size -= 1
+        last = edges[self.size]
+        edges[slot] = last
+        slots[last] = slot
+        edges[self.size] = edge
+        slots[edge] = self.size
+
+    def add(self, edge: int):
+        edges = self.edges
+        slots = self.slots
+        slot = slots[edge]
+        first = edges[self.size]
+        edges[slot] = first
+        slots[first] = slot
+        edges[self.size] = edge
+        slots[edge] = self.size
+        self.size += 1
+
+    def sample(self) -> int:
+        return self.edges[random.randrange(self.size)]
+
+    def __contains__(self, edge: int) -> bool:
+        return self.slots[edge] < self.size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.edges[:self.size])
@@ -0,0 +1,98 @@
+from typing import Optional, Tuple
+from GameAction import GameAction
+from GameState import GameState
+import numpy as np
+
+
+class GameEngine:
+    """
+    Headless Dots-and-Boxes game with the same rules as the GUI.
+
+    The status arrays follow GameState and are updated in place, so
+    references to them stay valid for the whole game. A player who
+    completes a box keeps the turn.
+    """
+
+    def __init__(self, number_of_dots: int = 4, player1_turn: bool = True):
+        self.board_status = np.zeros(
+            shape=(number_of_dots - 1, number_of_dots - 1))
+        self.row_status = np.zeros(shape=(number_of_dots, number_of_dots - 1))
+        self.col_status = np.zeros(shape=(number_of_dots - 1, number_of_dots))
+        self.player1_turn = player1_turn
+
+    @staticmethod
+    def from_state(state: GameState) -> "GameEngine":
+        engine = GameEngine.__new__(GameEngine)
+        engine.board_status = state.board_status.copy()
+        engine.row_status = state.row_status.copy()
+        engine.col_status = state.col_status.copy()
+        engine.player1_turn = bool(state.player1_turn)
+        return engine
+
+    def get_state(self) -> GameState:
+        return GameState(
+            self.board_status.copy(),
+            self.row_status.copy(),
+            self.col_status.copy(),
+            self.player1_turn,
+        )
+
+    def is_valid(self, action: Optional[GameAction]) -> bool:
+        if action is None or action.action_type not in ("row", "col"):
+            return False
+
+        x, y = action.position
+        matrix = self.row_status if action.action_type == "row" else self.col_status
+        [ny, nx] = matrix.shape
+        return 0 <= x < nx and 0 <= y < ny and matrix[y, x] == 0
+
+    def apply(self, action: GameAction) -> bool:
+        """
+        Marks the edge of action and returns True if a box was completed.
+        Raises ValueError if the action is not a legal move.
+        """
+        if not self.is_valid(action):
+            raise ValueError(f"Invalid action: {action}")
+
+        x, y = action.position
+        val = 1
+        player_modifier = -1 if self.player1_turn else 1
+        is_point_scored = False
+
+        [ny, nx] = self.board_status.shape
+        if y < ny and x < nx:
+            self.board_status[y, x] = (
+                abs(self.board_status[y, x]) + val
+            ) * player_modifier
+            if abs(self.board_status[y, x]) == 4:
+                is_point_scored = True
+
+        if action.action_type == "row":
+            self.row_status[y, x] = 1
+            if y >= 1:
+                self.board_status[y - 1, x] = (
+                    abs(self.board_status[y - 1, x]) + val
+                ) * player_modifier
+                if abs(self.board_status[y - 1, x]) == 4:
+                    is_point_scored = True
+
+        elif action.action_type == "col":
+            self.col_status[y, x] = 1
+            if x >= 1:
+                self.board_status[y, x - 1] = (
+                    abs(self.board_status[y, x - 1]) + val
+                ) * player_modifier
+                if abs(self.board_status[y, x - 1]) == 4:
+                    is_point_scored = True
+
+        if not is_point_scored:
+            self.player1_turn = not self.player1_turn
+        return is_point_scored
+
+    def is_gameover(self) -> bool:
+        return (self.row_status == 1).all() and (self.col_status == 1).all()
+
+    def get_scores(self) -> Tuple[int, int]:
+        player1_score = int(np.count_nonzero(self.board_status == -4))
+        player2_score = int(np.count_nonzero(self.board_status == 4))
+        return player1_score, player2_score
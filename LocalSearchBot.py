@@ -1,7 +1,13 @@
 from Bot import Bot
+from BitBoard import BitBoard
+from ChainAnalyzer import ChainAnalyzer
+from EndgameAnalyzer import EndgameAnalyzer
+from Evaluation import evaluate_many, evaluate_states
 from GameAction import GameAction
 from GameState import GameState
-from typing import List, Callable
+from SearchPosition import SearchPosition, Position
+from TimeManager import TimeManager, CLOCK_CHECK_MASK
+from typing import Dict, List, Callable, Optional, Sequence
 import random
 import math
 import numpy as np
@@ -16,66 +22,100 @@ class LocalSearchBot(Bot):
         end_temperature: float = 0,
         schedule: Callable[[int], float] = lambda t: math.e ** (-t / 100),
         precision: float = 1e-100,
+        time_manager: Optional[TimeManager] = None,
+        use_endgame_analyzer: bool = True,
+        timeout: float = TIMEOUT,
+        use_annealing: bool = True,
     ) -> None:
         self.end_temperature = end_temperature
         self.schedule = schedule
         self.precision = precision
         self.is_player1 = True
         self.global_time = 0
+        self.timeout = timeout
+        self.time_manager = time_manager if time_manager is not None else TimeManager(timeout)
+        self.use_endgame_analyzer = use_endgame_analyzer
+        # Tanpa annealing, langsung ambil aksi dengan nilai terbaik dari tabel
+        self.use_annealing = use_annealing
+
+        # Statistik pencarian terakhir
+        self.nodes = 0
+        self.iterations = 0
 
     # Pemilihan aksi yang akan dilakukan agent
     def get_action(self, state: GameState) -> GameAction:
         self.is_player1 = state.player1_turn
 
-        current = self.get_random_action(state)
+        # Posisi di-update secara in-place dengan make / unmake
+        position = SearchPosition(BitBoard.from_state(state))
+        self.time_manager.start_move(position)
+        self.nodes = 0
+        self.iterations = 0
+
+        # Langkah terpaksa dan endgame sederhana tidak perlu dicari
+        action = self.get_immediate_action(position)
+        if action is not None:
+            self.time_manager.end_move()
+            return position.layout.edge_actions[action]
+
+        # Nilai setiap aksi dihitung sekali dalam satu batch NumPy
+        values = self.get_action_values(position)
+        if not self.use_annealing:
+            best = max(values.values())
+            self.time_manager.end_move()
+            return position.layout.edge_actions[random.choice(
+                [action for action, value in values.items() if value == best])]
+
+        # Annealing tidak punya iterasi, batas lunak langsung dipakai
+        self.global_time = self.time_manager.soft_deadline
+        current = self.get_random_action(position)
         start_time = 1
-        self.global_time = time() + TIMEOUT
         while True:
             # Perhitungan delta dengan presisi 1e-300
             current_temperature = self.schedule(start_time)
-            if abs(current_temperature - self.end_temperature) <= self.precision or time() >= self.global_time:
+            if abs(current_temperature - self.end_temperature) <= self.precision:
+                break
+            if start_time & CLOCK_CHECK_MASK == 0 and time() >= self.global_time:
                 break
 
-            next = self.get_random_action(state)
-            delta = self.get_value(state, next) - \
-                self.get_value(state, current)
+            candidate = self.get_random_action(position)
+            delta = values[candidate] - values[current]
 
             # Jika delta positif atau tolerable maka ambil langkah selanjutnya
             if delta > 0 or random.random() < math.e ** (delta / current_temperature):
-                current = next
+                current = candidate
             start_time += 1
 
-        return current
-
-    # Pemilihan aksi random dari list yang tersedia
-    def get_random_action(self, state: GameState) -> GameAction:
-        actions = self.generate_actions(state)
-        return random.choice(actions)
-
-    # Generate list aksi yang bisa dilakukan
-    def generate_actions(self, state: GameState) -> List[GameAction]:
-        row_positions = self.generate_positions(state.row_status)
-        col_positions = self.generate_positions(state.col_status)
-        actions: List[GameAction] = []
-
-        for position in row_positions:
-            actions.append(GameAction("row", position))
-        for position in col_positions:
-            actions.append(GameAction("col", position))
-
-        return actions
-
-    # Generate posisi dari setiap garis yang masih kosong
-    def generate_positions(self, matrix: np.ndarray):
-        [ny, nx] = matrix.shape
-        positions: List[tuple[int, int]] = []
+        self.iterations = start_time - 1
+        self.time_manager.end_move()
+        return position.layout.edge_actions[current]
+
+    # Aksi yang tidak perlu dicari: langkah terpaksa, atau endgame sederhana
+    # (hanya chain dan loop) yang diselesaikan secara eksak. Langkah yang sama
+    # baiknya dipilih dengan rng, default random global
+    def get_immediate_action(self, position: SearchPosition, rng=random) -> Optional[int]:
+        if len(position.free_index) == 1:
+            return position.random_edge()
+
+        if self.use_endgame_analyzer:
+            move_values = EndgameAnalyzer.get(position.layout).move_values(position)
+            if move_values is not None:
+                best = max(move_values.values())
+                return rng.choice(sorted(
+                    edge for edge, value in move_values.items() if value == best))
+        return None
+
+    # Menghentikan get_action yang sedang berjalan pada iterasi berikutnya
+    def cancel(self):
+        self.global_time = 0
 
-        for y in range(ny):
-            for x in range(nx):
-                if matrix[y, x] == 0:
-                    positions.append((x, y))
+    # Pemilihan aksi random dalam O(1) dari index garis yang masih kosong
+    def get_random_action(self, position: SearchPosition) -> int:
+        return position.random_edge()
 
-        return positions
+    # Generate list garis yang masih kosong
+    def generate_actions(self, position: Position) -> List[int]:
+        return list(position.legal_edges())
 
     # Update board
     def get_result(self, state: GameState, action: GameAction) -> GameState:
@@ -127,99 +167,54 @@ class LocalSearchBot(Bot):
         )
         return new_state
 
+    # Tabel nilai get_value untuk setiap garis kosong, dipakai ulang selama annealing
+    def get_action_values(self, position: SearchPosition) -> Dict[int, float]:
+        board = position.to_board()
+        actions = self.generate_actions(position)
+        self.nodes += len(actions)
+        values = evaluate_many(
+            [board.get_result(action) for action in actions],
+            self.is_player1,
+            three_sided_as_lost=True,
+        )
+        return dict(zip(actions, values.tolist()))
+
     # Utility function dengan nilai absolute 1 jika box terbentuk.
-    def get_value(self, state: GameState, action: GameAction) -> float:
+    def get_value(self, position: SearchPosition, action: int) -> float:
 
-        new_state = self.get_result(state, action)
-        [ny, nx] = new_state.board_status.shape
-        utility = 0
-
-        # Menghitung jumlah box yang terbentuk
-        box_won = 0
-        box_lost = 0
-        for y in range(ny):
-            for x in range(nx):
-                if self.is_player1:
-                    if new_state.board_status[y, x] == -4:
-                        utility += 1
-                        box_won += 1
-                    elif new_state.board_status[y, x] == 4 or abs(new_state.board_status[y, x]) == 3:
-                        utility -= 1
-                        box_lost += 1
-                else:
-                    if new_state.board_status[y, x] == -4 or abs(new_state.board_status[y, x]) == 3:
-                        utility -= 1
-                        box_lost += 1
-                    elif new_state.board_status[y, x] == 4:
-                        utility += 1
-                        box_won += 1
+        self.nodes += 1
+        position.make(action)
+
+        # Menghitung jumlah box yang terbentuk, box dengan 3 sisi dianggap milik lawan
+        three_sided = position.box_sides.count(3)
+        if self.is_player1:
+            box_won = position.player1_score
+            box_lost = position.player2_score + three_sided
+        else:
+            box_won = position.player2_score
+            box_lost = position.player1_score + three_sided
+        utility = box_won - box_lost
 
         # Chain rule
-        if self.chain_count(new_state) % 2 == 0 and self.is_player1:
+        chain_count = self.chain_count(position)
+        if chain_count % 2 == 0 and self.is_player1:
             utility += 1
-        elif self.chain_count(new_state) % 2 != 0 and not self.is_player1:
+        elif chain_count % 2 != 0 and not self.is_player1:
             utility += 1
 
         # Win/Lose Heuristics
-        if box_won >= 5:
+        if 2 * box_won > position.layout.num_boxes:
             utility = np.inf
-        elif box_lost >= 5:
+        elif 2 * box_lost > position.layout.num_boxes:
             utility = -np.inf
 
+        position.unmake()
         return utility
 
+    # Nilai dari sekumpulan state sekaligus dalam satu panggilan NumPy, sama dengan get_value setelah aksi
+    def evaluate_many(self, states: Sequence[GameState]) -> np.ndarray:
+        return evaluate_states(states, self.is_player1, three_sided_as_lost=True)
+
     # Count the number of long chain(s)
-    def chain_count(self, state: GameState) -> int:
-
-        chain_count = 0
-        chain_list: List[List[int]] = []
-
-        for box_num in range(9):
-
-            # Check if box is already part of a chain
-            flag = False
-            for chain in chain_list:
-                if box_num in chain:
-                    flag = True
-                    break
-
-            if not flag:
-                chain_list.append([box_num])
-                self.add_chain(state, chain_list, box_num)
-
-        for chain in chain_list:
-            if len(chain) >= 3:
-                chain_count += 1
-
-        return chain_count
-
-    # Find adjacent box(es) which can build chain
-    def add_chain(self, state: GameState, chain_list: List[List[int]], box_num):
-
-        neighbors_num = [box_num - 1, box_num - 3, box_num + 1, box_num + 3]
-
-        for idx in range(len(neighbors_num)):
-            if (
-                neighbors_num[idx] < 0
-                or neighbors_num[idx] > 8
-                or (idx % 2 == 0 and neighbors_num[idx] // 3 != box_num // 3)
-            ):
-                continue
-
-            flag = False
-            for chain in chain_list:
-                if neighbors_num[idx] in chain:
-                    flag = True
-                    break
-
-            if not flag and idx % 2 == 0:
-                reference = max(box_num, neighbors_num[idx])
-                if not state.col_status[reference // 3][reference % 3]:
-                    chain_list[-1].append(neighbors_num[idx])
-                    self.add_chain(state, chain_list, neighbors_num[idx])
-
-            if not flag and idx % 2 != 0:
-                reference = max(box_num, neighbors_num[idx])
-                if not state.row_status[reference // 3][reference % 3]:
-                    chain_list[-1].append(neighbors_num[idx])
-                    self.add_chain(state, chain_list, neighbors_num[idx])
\ No newline at end of file
+    def chain_count(self, position: Position) -> int:
+        return ChainAnalyzer.get(position.layout).count_long_regions(position)
@@ -0,0 +1,341 @@
+from time import time
+from Bot import Bot
+from BatchPlayout import BatchPlayout
+from BitBoard import BitBoard
+from EndgameAnalyzer import EndgameAnalyzer
+from GameAction import GameAction
+from GameState import GameState
+from MoveOrdering import CAPTURE, SAFE, SACRIFICE
+from SearchPosition import SearchPosition
+from TimeManager import TimeManager, CRITICAL_SAFE_MOVES
+from typing import Dict, List, Optional
+import math
+import random
+
+TIMEOUT = 4.995
+
+# == Tree policies
+UCT = "uct"
+PUCT = "puct"
+SELECTIONS = (UCT, PUCT)
+
+# == Rollout policies
+UNIFORM = "uniform"
+SAFE_FIRST = "safe"
+ROLLOUT_POLICIES = (UNIFORM, SAFE_FIRST)
+
+# == Random picks tried before listing the safe moves of a rollout
+SAFE_GUESSES = 4
+
+# == Visits of a node before its sacrifices are expanded, while more than
+# == CRITICAL_SAFE_MOVES safe moves are left
+SACRIFICE_VISITS = 1000
+
+# == Prior weight of a move by category, for PUCT
+PRIOR_WEIGHTS = {CAPTURE: 4.0, SAFE: 2.0, SACRIFICE: 1.0}
+
+
+class MCTSNode:
+    """
+    A position of the search tree.
+
+    edge: move leading to the node, None at the root
+    player1: whether player 1 made that move
+    untried: legal moves without a child yet, the most promising last
+    deferred: sacrifices, kept out of untried until the node has
+        SACRIFICE_VISITS visits while the chain parity is not decided yet
+    priors: prior probability of every legal move, for PUCT
+    visits: playouts through the node
+    wins: their results for the player who made the move, 1 for a win
+        and 0.5 for a draw
+    """
+
+    __slots__ = ("edge", "player1", "parent", "children",
+                 "untried", "deferred", "priors", "visits", "wins")
+
+    def __init__(self, edge: Optional[int], player1: bool, parent: Optional["MCTSNode"], position: SearchPosition):
+        self.edge = edge
+        self.player1 = player1
+        self.parent = parent
+        self.children: Dict[int, MCTSNode] = {}
+        self.visits = 0
+        self.wins = 0.0
+
+        # == Expansion order and priors follow the category of every move
+        categories = {edge: classify(position, edge)
+                      for edge in position.legal_edges()}
+        self.untried = list(categories)
+        random.shuffle(self.untried)
+        self.untried.sort(key=lambda edge: PRIOR_WEIGHTS[categories[edge]])
+        self.deferred: List[int] = []
+        if list(categories.values()).count(SAFE) > CRITICAL_SAFE_MOVES:
+            self.deferred = [edge for edge in self.untried
+                             if categories[edge] == SACRIFICE]
+            self.untried = self.untried[len(self.deferred):]
+        total = sum(PRIOR_WEIGHTS[category] for category in categories.values())
+        self.priors = {edge: PRIOR_WEIGHTS[category] / total
+                       for edge, category in categories.items()}
+
+
+def classify(position: SearchPosition, edge: int) -> str:
+    category = SAFE
+    box_sides = position.box_sides
+    for box in position.layout.edge_boxes[edge]:
+        if box_sides[box] == 3:
+            return CAPTURE
+        if box_sides[box] == 2:
+            category = SACRIFICE
+    return category
+
+
+class MCTSBot(Bot):
+    """
+    Monte Carlo tree search.
+
+    selection: UCT, or PUCT with priors from the move categories
+        (captures, then safe moves, then sacrifices)
+    rollout_policy: UNIFORM random moves, or SAFE_FIRST: a capture if
+        there is one, else a random safe move, else a random move
+    exploration: exploration constant of the selection
+    use_endgame_analyzer: once no safe move is left, SAFE_FIRST rollouts
+        stop at the first simple endgame with its exact result, and simple
+        endgames at the root are answered without search
+    rollout_batch: with UNIFORM rollouts, random games played at once by
+        BatchPlayout from every expanded node
+
+    The subtree of the moves actually played is kept as the root of the
+    next search. Statistics of the last search: playouts,
+    playouts_per_second, nodes (the playouts, for the benchmark) and
+    search_depth (length of the most visited line).
+
+    Not competitive with AdversarialSearchBot: at a few thousand
+    playouts per second it beats RandomBot but loses to the minimax bot
+    on every board size measured, 6x6 boxes included. Use
+    AdversarialSearchBot to play; MCTSBot is a baseline for experiments.
+    """
+
+    def __init__(
+        self,
+        selection: str = UCT,
+        rollout_policy: str = SAFE_FIRST,
+        exploration: float = math.sqrt(2),
+        use_endgame_analyzer: bool = True,
+        time_manager: Optional[TimeManager] = None,
+        timeout: float = TIMEOUT,
+        rollout_batch: int = 1,
+    ):
+        if selection not in SELECTIONS:
+            raise ValueError(f"unknown selection {selection!r}")
+        if rollout_policy not in ROLLOUT_POLICIES:
+            raise ValueError(f"unknown rollout policy {rollout_policy!r}")
+        if rollout_batch < 1 or rollout_batch > 1 and rollout_policy != UNIFORM:
+            raise ValueError("rollout_batch > 1 needs UNIFORM rollouts")
+        self.selection = selection
+        self.rollout_policy = rollout_policy
+        self.exploration = exploration
+        self.rollout_batch = rollout_batch
+        self.use_endgame_analyzer = use_endgame_analyzer
+        self.endgame_analyzer: Optional[EndgameAnalyzer] = None
+        self.timeout = timeout
+        self.time_manager = time_manager if time_manager is not None else TimeManager(timeout)
+        self.global_time = 0
+
+        # == Tree kept between moves
+        self.root: Optional[MCTSNode] = None
+        self.root_board: Optional[BitBoard] = None
+
+        # == Statistics of the last search
+        self.playouts = 0
+        self.playouts_per_second = 0.0
+        self.nodes = 0
+        self.search_depth = 0
+
+    def get_action(self, state: GameState) -> GameAction:
+        start_time = time()
+        board = BitBoard.from_state(state)
+        self.time_manager.start_move(board)
+        self.playouts = 0
+        self.nodes = 0
+        self.search_depth = 0
+        self.endgame_analyzer = EndgameAnalyzer.get(
+            board.layout) if self.use_endgame_analyzer else None
+
+        # == A forced move needs no search
+        if board.free_edges().bit_count() == 1:
+            self.time_manager.end_move()
+            return board.layout.edge_actions[next(board.legal_edges())]
+
+        # == A simple endgame is solved without search
+        if self.endgame_analyzer is not None:
+            move_values = self.endgame_analyzer.move_values(board)
+            if move_values is not None:
+                best = max(move_values.values())
+                self.time_manager.end_move()
+                return board.layout.edge_actions[random.choice(
+                    [edge for edge, value in move_values.items() if value == best])]
+
+        self.advance_root(board)
+        self.global_time = self.time_manager.soft_deadline
+        position = SearchPosition(board)
+        while self.playouts == 0 or time() < self.global_time:
+            self.playouts += self.playout(position)
+
+        elapsed = time() - start_time
+        self.nodes = self.playouts
+        self.playouts_per_second = self.playouts / elapsed if elapsed > 0 else 0.0
+
+        node = self.root
+        while node.children:
+            node = max(node.children.values(), key=lambda child: child.visits)
+            self.search_depth += 1
+
+        edge = max(self.root.children.values(),
+                   key=lambda child: child.visits).edge
+        self.time_manager.end_move()
+        return board.layout.edge_actions[edge]
+
+    # == Stops the search at its next playout
+    def cancel(self):
+        self.global_time = 0
+
+    # == Reuse the subtree of the position reached, or start a new tree
+    def advance_root(self, board: BitBoard):
+        node = self.root
+        if node is not None and self.root_board.layout is board.layout:
+            played = board.edges & ~self.root_board.edges
+            if self.root_board.edges & ~board.edges:
+                node = None
+            position = SearchPosition(self.root_board)
+            while node is not None and played:
+                edge = next((edge for edge in node.children if played >> edge & 1), None)
+                node = node.children.get(edge) if edge is not None else None
+                if node is not None:
+                    position.make(edge)
+                    played &= ~(1 << edge)
+            if node is not None and position.to_board() != board:
+                node = None
+        else:
+            node = None
+
+        if node is None:
+            node = MCTSNode(None, not board.player1_turn,
+                            None, SearchPosition(board))
+        node.parent = None
+        self.root = node
+        self.root_board = board
+
+    # == Returns the number of games played
+    def playout(self, position: SearchPosition) -> int:
+        node = self.root
+        moves = 0
+
+        # == Selection
+        while True:
+            if node.deferred and node.visits >= SACRIFICE_VISITS:
+                node.untried = node.deferred + node.untried
+                node.deferred = []
+            if node.untried or not node.children:
+                break
+            node = self.select_child(node)
+            position.make(node.edge)
+            moves += 1
+
+        # == Expansion
+        if node.untried:
+            edge = node.untried.pop()
+            player1 = position.player1_turn
+            position.make(edge)
+            moves += 1
+            child = MCTSNode(edge, player1, node, position)
+            node.children[edge] = child
+            node = child
+
+        # == Simulation
+        if self.rollout_batch > 1:
+            games = self.rollout_batch
+            result = float(BatchPlayout.get(position.layout).results(position, games).sum())
+        else:
+            games = 1
+            result = self.rollout(position)
+
+        # == Backpropagation
+        while node is not None:
+            node.visits += games
+            node.wins += result if node.player1 else games - result
+            node = node.parent
+
+        for _ in range(moves):
+            position.unmake()
+        return games
+
+    def select_child(self, node: MCTSNode) -> MCTSNode:
+        exploration = self.exploration
+        if self.selection == UCT:
+            log_visits = math.log(node.visits)
+            return max(node.children.values(), key=lambda child: child.wins / child.visits
+                       + exploration * math.sqrt(log_visits / child.visits))
+
+        root_visits = math.sqrt(node.visits)
+        priors = node.priors
+        return max(node.children.values(), key=lambda child: child.wins / child.visits
+                   + exploration * priors[child.edge] * root_visits / (1 + child.visits))
+
+    def rollout(self, position: SearchPosition) -> float:
+        """
+        Plays the game out from position and returns the result for
+        player 1. The position is restored afterwards.
+        """
+        layout = position.layout
+        edge_boxes = layout.edge_boxes
+        box_masks = layout.box_masks
+        box_sides = position.box_sides
+        free: List[int] = list(position.legal_edges())
+        safe_first = self.rollout_policy == SAFE_FIRST
+        has_safe = safe_first
+        analyzer = self.endgame_analyzer if safe_first else None
+        margin = 0
+        moves = 0
+
+        while free:
+            index = None
+            if not has_safe and analyzer is not None:
+                # No safe move comes back, stop once the endgame is simple
+                value = analyzer.value(position)
+                if value is not None:
+                    margin = value if position.player1_turn else -value
+                    break
+            if safe_first and 3 in box_sides:
+                # Take a box first
+                box = box_sides.index(3)
+                index = free.index(
+                    (box_masks[box] & ~position.edges).bit_length() - 1)
+            elif has_safe:
+                # Most moves are safe early on, guess before scanning
+                for _ in range(SAFE_GUESSES):
+                    i = random.randrange(len(free))
+                    if all(box_sides[box] <= 1 for box in edge_boxes[free[i]]):
+                        index = i
+                        break
+                else:
+                    safe = [i for i, edge in enumerate(free)
+                            if all(box_sides[box] <= 1 for box in edge_boxes[edge])]
+                    if safe:
+                        index = random.choice(safe)
+                    else:
+                        has_safe = False
+                        continue
+            if index is None:
+                index = random.randrange(len(free))
+
+            free[index], free[-1] = free[-1], free[index]
+            position.make(free.pop())
+            moves += 1
+
+        difference = position.player1_score - position.player2_score + margin
+        for _ in range(moves):
+            position.unmake()
+        if difference > 0:
+            return 1.0
+        if difference < 0:
+            return 0.0
+        return 0.5
@@ -0,0 +1,529 @@
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import Value
+from time import time
+from Bot import Bot
+from BitBoard import BitBoard
+from GameAction import GameAction
+from GameState import GameState
+from LocalSearchBot import LocalSearchBot, TIMEOUT
+from SearchPosition import SearchPosition
+from TimeManager import TimeManager, CLOCK_CHECK_MASK
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import math
+import os
+import random
+
+# == Extra time given to the workers to report after the deadline
+REPORT_MARGIN = 0.5
+
+# == Cooling of independent chains: T(t) = initial_temperature * e^(-t / DECAY), as the LocalSearchBot
+# == default. Chains that exchange keep their temperature (decay = inf), as in parallel tempering
+DECAY = 100.0
+
+# == Initial temperature of chain k is TEMPERATURE_SCALE * TEMPERATURE_RATIO ** k. Plan values are
+# == LocalSearchBot utilities in boxes, so chain 0 accepts a plan one box worse with probability e^-2
+TEMPERATURE_SCALE = 0.5
+TEMPERATURE_RATIO = 2.0
+
+# == Moves of the bot in a plan
+HORIZON = 2
+
+# == Iterations a chain runs before the next chain of its worker, without exchange_interval
+SLICE = 50
+
+# == Exchange rounds a worker runs between two reports to the coordinator
+EXCHANGE_ROUNDS = 8
+
+Plan = Tuple[int, ...]
+
+# == State of a worker process: the cancel flag of the bot and the plan evaluator of the current move
+_cancelled = None
+_evaluator: Optional["PlanEvaluator"] = None
+
+
+class AnnealingChain(NamedTuple):
+    """
+    State and statistics of one annealing chain.
+
+    seed: seed of the random generator of the chain
+    initial_temperature: temperature at iteration 0
+    decay: the temperature falls by a factor e every decay iterations
+    rng_state: state of the random generator, to resume the chain
+    current: current plan
+    best: best plan visited
+    current_value: value of current, None before the first report
+    best_value: value of best, None before the first report
+    iterations: iterations run so far
+    accepted: accepted proposals
+    elapsed: seconds spent running the chain
+    finished: True once the temperature reached the precision
+    """
+
+    seed: int
+    initial_temperature: float
+    decay: float
+    rng_state: tuple
+    current: Plan
+    best: Plan
+    current_value: Optional[float] = None
+    best_value: Optional[float] = None
+    iterations: int = 0
+    accepted: int = 0
+    elapsed: float = 0.0
+    finished: bool = False
+
+    def temperature(self) -> float:
+        return self.initial_temperature * math.exp(-self.iterations / self.decay)
+
+    @property
+    def acceptance_rate(self) -> float:
+        return self.accepted / self.iterations if self.iterations else 0.0
+
+    @property
+    def iterations_per_second(self) -> float:
+        return self.iterations / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class PlanEvaluator:
+    """
+    LocalSearchBot objective of a plan: the bot's moves of the plan are
+    played from board in order, the opponent answering each with the best
+    edge of its own LocalSearchBot table, and the plan is worth the
+    LocalSearchBot value (get_value) of its last move. A plan of one move
+    is worth exactly the table entry of that move. A move that has been
+    played already is replaced by the next free edge, so every plan of
+    free edges of board can be played. Values and replies are cached.
+    """
+
+    def __init__(self, board: BitBoard, is_player1: bool, seed: int):
+        self.seed = seed
+        self.is_player1 = is_player1
+        self.position = SearchPosition(board)
+        self.bot = LocalSearchBot()
+        self.bot.is_player1 = is_player1
+        self.opponent = LocalSearchBot()
+        self.opponent.is_player1 = not is_player1
+        self.values: Dict[Plan, float] = {}
+        self.replies: Dict[Tuple[int, int], int] = {}
+
+    def value(self, plan: Plan) -> float:
+        value = self.values.get(plan)
+        if value is None:
+            value = self.play(plan)
+            self.values[plan] = value
+        return value
+
+    def play(self, plan: Plan) -> float:
+        position = self.position
+        made = 0
+        value = 0.0
+        for index, edge in enumerate(plan):
+            while position.player1_turn != self.is_player1 and not position.is_terminal():
+                position.make(self.reply(position))
+                made += 1
+            if position.is_terminal():
+                value = self.final_value(position)
+                break
+
+            while edge not in position.free_index:
+                edge = (edge + 1) % position.layout.num_edges
+            if index == len(plan) - 1 or len(position.free_index) == 1:
+                value = self.bot.get_value(position, edge)
+                break
+            position.make(edge)
+            made += 1
+
+        for _ in range(made):
+            position.unmake()
+        return value
+
+    def reply(self, position: SearchPosition) -> int:
+        key = (position.edges, position.player1_boxes)
+        reply = self.replies.get(key)
+        if reply is None:
+            values = self.opponent.get_action_values(position)
+            reply = max(values, key=lambda edge: (values[edge], -edge))
+            self.replies[key] = reply
+        return reply
+
+    # == Win/Lose Heuristics of get_value on a finished game
+    def final_value(self, position: SearchPosition) -> float:
+        if self.is_player1:
+            margin = position.player1_score - position.player2_score
+        else:
+            margin = position.player2_score - position.player1_score
+        return math.copysign(math.inf, margin) if margin else 0.0
+
+
+def _init_worker(cancelled):
+    global _cancelled
+    _cancelled = cancelled
+
+
+def _ready() -> bool:
+    return True
+
+
+def _get_evaluator(board: BitBoard, is_player1: bool, seed: int) -> PlanEvaluator:
+    global _evaluator
+    if _evaluator is None or _evaluator.seed != seed:
+        _evaluator = PlanEvaluator(board, is_player1, seed)
+    return _evaluator
+
+
+def difference(a: float, b: float) -> float:
+    # Equal infinite values differ by 0, not nan
+    return a - b if a != b else 0.0
+
+
+def exchange(chains: List[AnnealingChain], pairs: List[int], rng: random.Random) -> Tuple[int, int]:
+    """
+    Swaps the current plans of chains[low] and chains[low + 1] for every
+    low in pairs with the parallel tempering acceptance probability, and
+    returns the attempted and accepted swaps.
+    """
+    attempts = accepted = 0
+    for low in pairs:
+        cold, hot = chains[low], chains[low + 1]
+        if cold.finished or hot.finished or cold.current_value is None or hot.current_value is None:
+            continue
+        attempts += 1
+
+        # Metropolis criterion of the swap for target densities e^(value / T)
+        exponent = difference(hot.current_value, cold.current_value) * (
+            1 / cold.temperature() - 1 / hot.temperature())
+        if exponent >= 0 or rng.random() < math.exp(exponent):
+            chains[low] = cold._replace(current=hot.current, current_value=hot.current_value)
+            chains[low + 1] = hot._replace(current=cold.current, current_value=cold.current_value)
+            accepted += 1
+    return attempts, accepted
+
+
+def _run_chain(
+    evaluator: PlanEvaluator,
+    actions: List[int],
+    chain: AnnealingChain,
+    iterations: int,
+    precision: float,
+    deadline: float,
+) -> Tuple[AnnealingChain, bool]:
+    """
+    Runs a chain for `iterations` iterations, until its temperature
+    reaches the precision, or until the deadline or the cancel flag.
+    The annealing step is the one of LocalSearchBot; a proposal replaces
+    one move of the current plan by a random free edge. Returns the chain
+    and True if it was stopped by the deadline or the cancel flag.
+    """
+    start = time()
+    rng = random.Random()
+    rng.setstate(chain.rng_state)
+    current = chain.current
+    best = chain.best
+    accepted = chain.accepted
+    iteration = chain.iterations
+    stop = iteration + iterations
+    finished = stopped = False
+
+    if chain.current_value is None:
+        current_value = best_value = evaluator.value(current)
+    else:
+        current_value, best_value = chain.current_value, chain.best_value
+
+    while iteration < stop:
+        temperature = chain.initial_temperature * math.exp(-(iteration + 1) / chain.decay)
+        if temperature <= precision:
+            finished = True
+            break
+
+        candidate = list(current)
+        candidate[rng.randrange(len(candidate))] = rng.choice(actions)
+        candidate = tuple(candidate)
+        # A new plan costs milliseconds, a cached one a lookup
+        if candidate not in evaluator.values or iteration & CLOCK_CHECK_MASK == 0:
+            if time() >= deadline or _cancelled.value:
+                stopped = True
+                break
+        value = evaluator.value(candidate)
+
+        delta = difference(value, current_value)
+        if delta > 0 or rng.random() < math.e ** (delta / temperature):
+            current, current_value = candidate, value
+            accepted += 1
+            if current_value > best_value:
+                best, best_value = current, current_value
+        iteration += 1
+
+    chain = chain._replace(
+        rng_state=rng.getstate(),
+        current=current,
+        best=best,
+        current_value=current_value,
+        best_value=best_value,
+        iterations=iteration,
+        accepted=accepted,
+        elapsed=chain.elapsed + time() - start,
+        finished=finished,
+    )
+    return chain, stopped
+
+
+def _run_group(
+    board: BitBoard,
+    is_player1: bool,
+    seed: int,
+    chains: List[AnnealingChain],
+    offset: int,
+    first_round: int,
+    rounds: Optional[int],
+    interval: int,
+    exchanges: bool,
+    precision: float,
+    deadline: float,
+    exchange_seed: int,
+) -> Tuple[List[AnnealingChain], int, int, int]:
+    """
+    Runs the chains of one worker in turns of `interval` iterations, for
+    `rounds` turns (None for no limit). With exchanges, neighbouring
+    chains of the group try to swap after every turn, even pairs of the
+    whole ladder (chains[0] is chain `offset`) in even rounds, counted
+    from first_round, and odd pairs in odd rounds. Returns the chains,
+    the plans evaluated and the attempted and accepted swaps.
+    """
+    evaluator = _get_evaluator(board, is_player1, seed)
+    known = len(evaluator.values)
+    actions = list(board.legal_edges())
+    rng = random.Random(exchange_seed)
+    chains = list(chains)
+    attempts = accepted = 0
+
+    round_index = 0
+    stopped = False
+    while not stopped and (rounds is None or round_index < rounds):
+        running = [index for index, chain in enumerate(chains) if not chain.finished]
+        if not running:
+            break
+        for index in running:
+            chains[index], stopped = _run_chain(
+                evaluator, actions, chains[index], interval, precision, deadline)
+            if stopped:
+                break
+        if exchanges and not stopped:
+            parity = (first_round + round_index) % 2
+            pairs = [low for low in range(len(chains) - 1) if (offset + low) % 2 == parity]
+            swaps = exchange(chains, pairs, rng)
+            attempts += swaps[0]
+            accepted += swaps[1]
+        round_index += 1
+
+    return chains, len(evaluator.values) - known, attempts, accepted
+
+
+class ParallelAnnealingBot(Bot):
+    """
+    Multi-start simulated annealing of move plans over a process pool.
+
+    LocalSearchBot anneals over the free edges, at most a few dozen
+    states. Here a state is a plan of `horizon` moves of the bot, played
+    against the LocalSearchBot table as opponent and valued with the
+    LocalSearchBot objective after its last move (PlanEvaluator), and a
+    proposal changes one move of the plan. The first move of the best plan
+    visited by any chain is played, at the latest at the soft deadline of
+    the time manager.
+
+    `chains` chains are split into contiguous groups of temperatures, one
+    per worker, and a worker runs its chains in turns. Chain k starts at
+    temperature temperature_scale * temperature_ratio ** k; independent
+    chains cool like the LocalSearchBot default schedule. The random
+    generators of the chains are seeded from `seed`, so a seeded bot
+    starts the same chains, but how far they get by the deadline depends
+    on the machine and its load: moves, and so games, are not
+    reproducible.
+
+    exchange_interval: 0 for independent chains, else the chains keep
+        their temperature and neighbouring temperatures try to swap their
+        current plans every exchange_interval iterations with the
+        parallel tempering acceptance probability (replica exchange). A
+        worker runs EXCHANGE_ROUNDS exchanges between two reports, and
+        swaps across workers are tried at the reports.
+
+    chain_reports holds the chains of the last move, with their
+    iterations, acceptance_rate and iterations_per_second, nodes the
+    number of plans evaluated and exchange_acceptance_rate the share of
+    accepted swaps. cancel() stops the workers through a shared flag.
+    Call close(), or use the bot in a with block, to stop the pool.
+    """
+
+    def __init__(
+        self,
+        chains: Optional[int] = None,
+        workers: Optional[int] = None,
+        exchange_interval: int = 0,
+        horizon: int = HORIZON,
+        temperature_scale: float = TEMPERATURE_SCALE,
+        temperature_ratio: float = TEMPERATURE_RATIO,
+        precision: float = 1e-100,
+        seed: Optional[int] = None,
+        use_endgame_analyzer: bool = True,
+        time_manager: Optional[TimeManager] = None,
+        timeout: float = TIMEOUT,
+    ):
+        if exchange_interval < 0:
+            raise ValueError("exchange_interval must not be negative")
+        if horizon < 1:
+            raise ValueError("horizon must be at least 1")
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.chains = chains if chains is not None else self.workers
+        self.exchange_interval = exchange_interval
+        self.horizon = horizon
+        self.temperature_scale = temperature_scale
+        self.temperature_ratio = temperature_ratio
+        self.precision = precision
+        self.timeout = timeout
+        self.time_manager = time_manager if time_manager is not None else TimeManager(timeout)
+        self.bot = LocalSearchBot(
+            precision=precision,
+            time_manager=self.time_manager,
+            use_endgame_analyzer=use_endgame_analyzer,
+            timeout=timeout,
+        )
+        self.global_time = 0
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.cancelled = None
+
+        # == Without a seed, draw one from the global generator, which the Arena seeds
+        self.rng = random.Random(seed if seed is not None else random.randrange(1 << 32))
+
+        # == Statistics of the last search
+        self.chain_reports: List[AnnealingChain] = []
+        self.iterations = 0
+        self.nodes = 0
+        self.exchanges = 0
+        self.exchanges_accepted = 0
+
+        # == Start-up of the workers is not charged to the first move
+        self.start_workers()
+
+    @property
+    def exchange_acceptance_rate(self) -> float:
+        return self.exchanges_accepted / self.exchanges if self.exchanges else 0.0
+
+    def start_workers(self):
+        if self.executor is not None:
+            return
+        self.cancelled = Value("b", 0)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.cancelled,),
+        )
+        wait([self.executor.submit(_ready) for _ in range(self.workers)])
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    # == The workers stop at their next clock check
+    def cancel(self):
+        self.global_time = 0
+        if self.cancelled is not None:
+            self.cancelled.value = 1
+
+    def __enter__(self) -> "ParallelAnnealingBot":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_action(self, state: GameState) -> GameAction:
+        self.start_workers()
+        self.cancelled.value = 0
+        bot = self.bot
+        bot.is_player1 = state.player1_turn
+        bot.nodes = 0
+        position = SearchPosition(BitBoard.from_state(state))
+        self.time_manager.start_move(position)
+        self.chain_reports = []
+        self.iterations = 0
+        self.nodes = 0
+        self.exchanges = 0
+        self.exchanges_accepted = 0
+
+        action = bot.get_immediate_action(position, self.rng)
+        if action is not None:
+            self.time_manager.end_move()
+            return position.layout.edge_actions[action]
+
+        board = position.to_board()
+        self.global_time = self.time_manager.soft_deadline
+        seed = self.rng.randrange(1 << 32)
+        chains = self.start_chains(list(board.legal_edges()))
+        bounds = self.group_bounds()
+
+        exchanges = self.exchange_interval > 0
+        interval = self.exchange_interval if exchanges else SLICE
+        rounds = EXCHANGE_ROUNDS if exchanges else None
+        round_index = 0
+        while any(not chain.finished for chain in chains) and time() < self.global_time:
+            futures = [
+                self.executor.submit(
+                    _run_group, board, bot.is_player1, seed, chains[start:stop], start, round_index,
+                    rounds, interval, exchanges, self.precision, self.global_time,
+                    self.rng.randrange(1 << 32))
+                for start, stop in bounds
+            ]
+            # Late workers are cancelled and drained, nothing runs into the next move
+            _, late = wait(futures, timeout=max(0.0, self.global_time - time()) + REPORT_MARGIN)
+            if late:
+                self.cancelled.value = 1
+                wait(late)
+            for (start, stop), future in zip(bounds, futures):
+                chains[start:stop], nodes, attempts, accepted = future.result()
+                self.nodes += nodes
+                self.exchanges += attempts
+                self.exchanges_accepted += accepted
+
+            if not exchanges:
+                break
+            attempts, accepted = exchange(chains, [stop - 1 for _, stop in bounds[:-1]], self.rng)
+            self.exchanges += attempts
+            self.exchanges_accepted += accepted
+            round_index += rounds
+
+        self.chain_reports = chains
+        self.iterations = sum(chain.iterations for chain in chains)
+        values = {}
+        for chain in chains:
+            if chain.best_value is not None:
+                values[chain.best[0]] = max(chain.best_value, values.get(chain.best[0], -math.inf))
+        # == Chains cut before their first plan fall back to the LocalSearchBot table
+        if not values:
+            values = bot.get_action_values(position)
+        best = max(values.values())
+        action = self.rng.choice(sorted(action for action, value in values.items() if value == best))
+        self.time_manager.end_move()
+        return position.layout.edge_actions[action]
+
+    def start_chains(self, actions: List[int]) -> List[AnnealingChain]:
+        chains = []
+        for index in range(self.chains):
+            seed = self.rng.randrange(1 << 32)
+            rng = random.Random(seed)
+            plan = tuple(rng.choice(actions) for _ in range(self.horizon))
+            chains.append(AnnealingChain(
+                seed,
+                self.temperature_scale * self.temperature_ratio ** index,
+                DECAY if self.exchange_interval == 0 else math.inf,
+                rng.getstate(),
+                plan,
+                plan,
+            ))
+        return chains
+
+    # == Contiguous ranges of chains, one per worker
+    def group_bounds(self) -> List[Tuple[int, int]]:
+        groups = min(self.workers, self.chains)
+        return [
+            (group * self.chains // groups, (group + 1) * self.chains // groups)
+            for group in range(groups)
+        ]
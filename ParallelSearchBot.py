@@ -0,0 +1,256 @@
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import Value
+from time import time
+from Bot import Bot
+from BitBoard import BitBoard
+from AdversarialSearchBot import AdversarialSearchBot, TIMEOUT
+from EndgameAnalyzer import EndgameAnalyzer
+from GameAction import GameAction
+from GameState import GameState
+from MoveOrdering import MoveOrderer
+from SearchPosition import SearchPosition
+from typing import Callable, Dict, List, Optional, Tuple
+import os
+import random
+import numpy as np
+
+# == Extra time given to the workers to report after the deadline
+REPORT_MARGIN = 0.5
+
+# == State of a worker process
+_worker_factory: Optional[Callable[[], AdversarialSearchBot]] = None
+_worker_bot: Optional[AdversarialSearchBot] = None
+_worker_best = None
+_worker_cancelled = None
+
+
+def _init_worker(bot_factory: Callable[[], AdversarialSearchBot], shared_best, cancelled):
+    global _worker_factory, _worker_bot, _worker_best, _worker_cancelled
+    _worker_factory = bot_factory
+    _worker_bot = bot_factory()
+    _worker_best = shared_best
+    _worker_cancelled = cancelled
+
+
+def _ready() -> bool:
+    return True
+
+
+def _search_root_moves(
+    board: BitBoard,
+    actions: List[int],
+    max_depth: int,
+    deadline: float,
+    new_move: bool,
+    deterministic: bool,
+) -> Tuple[Dict[int, float], bool, int]:
+    """
+    Searches a share of the root moves in a worker. Returns the values of
+    the moves searched before the deadline, whether that was all of them,
+    and the number of nodes searched.
+    """
+    global _worker_bot
+    if new_move and deterministic:
+        # Nothing may depend on earlier searches cut by the clock
+        _worker_bot = _worker_factory()
+
+    bot = _worker_bot
+    bot.is_player1 = board.player1_turn
+    bot.global_time = deadline
+    bot.cancel_flag = _worker_cancelled
+    bot.nodes = 0
+    if new_move:
+        bot.prepare_transposition_table(board)
+        bot.move_orderer.new_search()
+
+    position = SearchPosition(board, bot.zobrist)
+    shared_best = None if deterministic else _worker_best
+    scores = {}
+    try:
+        bot.search_root_moves(
+            position, actions, max_depth, shared_best, scores)
+    except TimeoutError:
+        return scores, False, bot.nodes
+    return scores, True, bot.nodes
+
+
+class ParallelSearchBot(Bot):
+    """
+    Root-split parallel version of AdversarialSearchBot.
+
+    Every iteration of the iterative deepening splits the ordered root
+    moves over `workers` processes, each one keeping its own bot, and so
+    its transposition table and move ordering, for the whole game. Root
+    moves are dealt round-robin, so every worker starts with one of the
+    best moves of the previous iteration.
+
+    deterministic=False: workers share the best root value found so far
+        through shared memory, so each of them can cut moves that cannot
+        beat any other worker's best.
+    deterministic=True: workers only use their own bound and start every
+        move from a fresh bot, and ties are broken by move order, so the
+        move chosen for a given completed depth does not depend on timing.
+        Partly searched iterations are only used by the default mode, as in
+        AdversarialSearchBot.
+
+    Forced moves and simple endgames (see EndgameAnalyzer, unless
+    use_endgame_analyzer=False) are answered without the workers, and the
+    deepening stops once a root value is proven. cancel(), and workers
+    still searching at the deadline, stop through a shared flag that the
+    clock check of the worker bots reads.
+
+    bot_factory must be picklable (a class or functools.partial). Call
+    close() to stop the workers.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        deterministic: bool = False,
+        bot_factory: Callable[[], AdversarialSearchBot] = AdversarialSearchBot,
+        timeout: float = TIMEOUT,
+        use_endgame_analyzer: bool = True,
+    ):
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.deterministic = deterministic
+        self.bot_factory = bot_factory
+        self.timeout = timeout
+        self.use_endgame_analyzer = use_endgame_analyzer
+        self.global_time = 0
+        self.move_orderer = MoveOrderer(use_history=False)
+        self.executors: List[ProcessPoolExecutor] = []
+        self.shared_best = None
+        self.cancelled = None
+        self.search_depth = 0
+
+        # == Statistics of the last search
+        self.nodes = 0
+        self.depth_times: List[float] = []
+        self.partial_depth = 0
+
+        # == Start-up of the workers is not charged to the first move
+        self.start_workers()
+
+    # == One single-process executor per worker, so a worker always gets the same share
+    def start_workers(self):
+        if self.executors:
+            return
+        self.shared_best = Value("d", -np.inf)
+        self.cancelled = Value("b", 0)
+        self.executors = [
+            ProcessPoolExecutor(
+                max_workers=1,
+                initializer=_init_worker,
+                initargs=(self.bot_factory, self.shared_best, self.cancelled),
+            )
+            for _ in range(self.workers)
+        ]
+        wait([executor.submit(_ready) for executor in self.executors])
+
+    def close(self):
+        for executor in self.executors:
+            executor.shutdown(cancel_futures=True)
+        self.executors = []
+
+    def __enter__(self) -> "ParallelSearchBot":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # == Workers stop at their next clock check
+    def cancel(self):
+        self.global_time = 0
+        if self.cancelled is not None:
+            self.cancelled.value = 1
+
+    def get_action(self, state: GameState) -> GameAction:
+        start_time = time()
+        self.global_time = start_time + self.timeout
+        self.nodes = 0
+        self.depth_times = []
+        self.partial_depth = 0
+
+        board = BitBoard.from_state(state)
+        self.search_depth = 0
+
+        # == A forced move needs no search
+        if board.free_edges().bit_count() == 1:
+            return board.layout.edge_actions[next(board.legal_edges())]
+
+        # == A simple endgame is solved without search
+        if self.use_endgame_analyzer:
+            move_values = EndgameAnalyzer.get(board.layout).move_values(board)
+            if move_values is not None:
+                best = max(move_values.values())
+                best_actions = [action for action, value in sorted(
+                    move_values.items()) if value == best]
+                if self.deterministic:
+                    return board.layout.edge_actions[best_actions[0]]
+                return board.layout.edge_actions[random.choice(best_actions)]
+
+        self.start_workers()
+        self.cancelled.value = 0
+
+        # == The most promising move by ordering alone is ready before any search
+        selected = self.move_orderer.order(board)[0][0]
+        scores = {}
+        for i in range(board.free_edges().bit_count()):
+            # == Search the selected move of the previous iteration first
+            actions = self.move_orderer.order(board)[0]
+            actions.sort(key=lambda action: (scores.get(
+                action, -np.inf), action == selected), reverse=True)
+
+            self.shared_best.value = -np.inf
+            futures = [
+                executor.submit(
+                    _search_root_moves,
+                    board,
+                    actions[index::self.workers],
+                    i + 1,
+                    self.global_time,
+                    i == 0,
+                    self.deterministic,
+                )
+                for index, executor in enumerate(self.executors)
+                if actions[index::self.workers]
+            ]
+            _, late = wait(futures, timeout=max(
+                0.0, self.global_time - time()) + REPORT_MARGIN)
+            # == Late workers are cancelled and drained, nothing runs into the next search
+            if late:
+                self.cancelled.value = 1
+                wait(late)
+
+            scores = {}
+            complete = not late
+            for future in futures:
+                worker_scores, worker_complete, nodes = future.result()
+                self.nodes += nodes
+                complete = complete and worker_complete
+                scores.update(worker_scores)
+            if not complete:
+                # == The selected move was searched first, an exact higher value beats it
+                if (not self.deterministic and selected in scores
+                        and max(scores.values()) > scores[selected]):
+                    best = max(scores.values())
+                    selected = random.choice(
+                        [action for action, score in scores.items() if score == best])
+                    self.partial_depth = i + 1
+                break
+
+            best = max(scores.values())
+            best_actions = [
+                action for action in actions if scores.get(action) == best]
+            if self.deterministic:
+                selected = best_actions[0]
+            else:
+                selected = random.choice(best_actions)
+            self.search_depth = i + 1
+            self.depth_times.append(time() - start_time)
+
+            # == Stop on a proven result
+            if abs(best) == np.inf:
+                break
+
+        return board.layout.edge_actions[selected]
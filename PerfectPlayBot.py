@@ -0,0 +1,50 @@
+from Bot import Bot
+from BitBoard import BitBoard, BoardLayout
+from GameAction import GameAction
+from GameState import GameState
+from PerfectPlayDatabase import PerfectPlayDatabase, MAX_EDGES
+from typing import Dict, Optional
+import random
+
+
+class PerfectPlayBot(Bot):
+    """
+    Plays perfectly from a PerfectPlayDatabase: every move is a lookup of
+    the value of each free edge in the memory-mapped table.
+
+    path: table to load, by default the one PerfectPlayDatabase.py saves
+        for the board size
+    fallback: bot used on boards without a table, AdversarialSearchBot
+        by default
+    """
+
+    def __init__(self, path: Optional[str] = None, fallback: Optional[Bot] = None):
+        self.path = path
+        self.fallback = fallback
+        self.databases: Dict[BoardLayout, Optional[PerfectPlayDatabase]] = {}
+
+    def get_database(self, layout: BoardLayout) -> Optional[PerfectPlayDatabase]:
+        if layout not in self.databases:
+            database = None
+            if layout.num_edges <= MAX_EDGES:
+                try:
+                    database = PerfectPlayDatabase.load(layout, self.path)
+                except (OSError, ValueError):
+                    database = None
+            self.databases[layout] = database
+        return self.databases[layout]
+
+    def get_action(self, state: GameState) -> GameAction:
+        board = BitBoard.from_state(state)
+        database = self.get_database(board.layout)
+        if database is None:
+            if self.fallback is None:
+                from AdversarialSearchBot import AdversarialSearchBot
+                self.fallback = AdversarialSearchBot()
+            return self.fallback.get_action(state)
+
+        move_values = database.move_values(board)
+        best = max(move_values.values())
+        best_actions = [edge for edge,
+                        value in move_values.items() if value == best]
+        return board.layout.edge_actions[random.choice(best_actions)]
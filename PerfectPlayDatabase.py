@@ -0,0 +1,133 @@
+from typing import Dict, Optional
+from BitBoard import BoardLayout
+from SearchPosition import Position
+import argparse
+import os
+import numpy as np
+
+# == Largest board solved completely, the table has 2 ** num_edges entries
+MAX_EDGES = 28
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def get_default_path(layout: BoardLayout) -> str:
+    return os.path.join(DATA_DIRECTORY, f"perfect_play_{layout.rows}x{layout.cols}.npy")
+
+
+def popcounts(count: int) -> np.ndarray:
+    # == Number of set bits of 0 .. count - 1
+    values = np.arange(count, dtype=np.uint32)
+    bits = np.zeros(count, dtype=np.uint8)
+    while count > 1:
+        bits += (values & 1).astype(np.uint8)
+        values >>= 1
+        count >>= 1
+    return bits
+
+
+def capture_counts(layout: BoardLayout, edge: int, edge_sets: np.ndarray) -> np.ndarray:
+    # == Number of boxes completed by marking edge in each of edge_sets
+    captured = np.zeros(len(edge_sets), dtype=np.int8)
+    for box in layout.edge_boxes[edge]:
+        others = layout.box_masks[box] & ~(1 << edge)
+        captured += (edge_sets & others) == others
+    return captured
+
+
+class PerfectPlayDatabase:
+    """
+    Exact values of every position of a small board.
+
+    Whoever owns the taken boxes and whose turn it is, the best margin the
+    player to move can still get out of the untaken boxes only depends on
+    the marked edges. values[edges] holds that margin (boxes won minus
+    boxes lost from now on, both sides playing perfectly) as an int8, so
+    the final score difference of a position is its current one plus
+    values[edges]. The table is solved by retrograde analysis, from the
+    full board back to the empty one, and stored as a .npy file that is
+    memory-mapped on load.
+    """
+
+    def __init__(self, layout: BoardLayout, values: np.ndarray):
+        self.layout = layout
+        self.values = values
+
+    @staticmethod
+    def solve(layout: BoardLayout) -> "PerfectPlayDatabase":
+        num_edges = layout.num_edges
+        if num_edges > MAX_EDGES:
+            raise ValueError(
+                f"{layout.rows}x{layout.cols} boxes have {num_edges} edges, at most {MAX_EDGES} can be solved")
+
+        values = np.zeros(1 << num_edges, dtype=np.int8)
+        marked = popcounts(1 << num_edges)
+
+        # == Every move marks one more edge, so layer n - 1 only needs layer n
+        for count in range(num_edges - 1, -1, -1):
+            edge_sets = np.flatnonzero(marked == count).astype(np.int64)
+            best = np.full(len(edge_sets), -128, dtype=np.int8)
+            for edge in range(num_edges):
+                free = (edge_sets >> edge & 1) == 0
+                parents = edge_sets[free]
+                children = values[parents | (1 << edge)]
+
+                # The player keeps the turn after completing a box
+                captured = capture_counts(layout, edge, parents)
+                value = np.where(captured > 0, captured + children, -children)
+                best[free] = np.maximum(best[free], value)
+            values[edge_sets] = best
+
+        return PerfectPlayDatabase(layout, values)
+
+    @staticmethod
+    def load(layout: BoardLayout, path: Optional[str] = None) -> "PerfectPlayDatabase":
+        if path is None:
+            path = get_default_path(layout)
+        values = np.load(path, mmap_mode="r")
+        if values.shape != (1 << layout.num_edges,):
+            raise ValueError(
+                f"{path} does not hold a {layout.rows}x{layout.cols} table")
+        return PerfectPlayDatabase(layout, values)
+
+    def save(self, path: Optional[str] = None):
+        if path is None:
+            path = get_default_path(self.layout)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.save(path, np.asarray(self.values))
+
+    # == Margin the player to move still gets with perfect play
+    def value(self, board: Position) -> int:
+        return int(self.values[board.edges])
+
+    def move_values(self, board: Position) -> Dict[int, int]:
+        """
+        Margin the player to move gets from now on by marking each free
+        edge and playing perfectly afterwards.
+        """
+        layout = self.layout
+        values = self.values
+        move_values = {}
+        for edge in board.legal_edges():
+            edges = board.edges | 1 << edge
+            captured = 0
+            for box in layout.edge_boxes[edge]:
+                mask = layout.box_masks[box]
+                if edges & mask == mask:
+                    captured += 1
+            child = int(values[edges])
+            move_values[edge] = captured + child if captured else -child
+        return move_values
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Solve a small board completely by retrograde analysis")
+    parser.add_argument("--dots", type=int, default=4)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    layout = BoardLayout.get(args.dots - 1, args.dots - 1)
+    database = PerfectPlayDatabase.solve(layout)
+    database.save(args.output)
+    print(f"margin of the first player on the empty board: {int(database.values[0])}")
@@ -1,46 +1,38 @@
+from typing import Optional
 from Bot import Bot
+from BitBoard import BitBoard
+from FreeEdgeIndex import FreeEdgeIndex
 from GameAction import GameAction
 from GameState import GameState
-import random
-import numpy as np
 
 
 class RandomBot(Bot):
-    def get_action(self, state: GameState) -> GameAction:
-        all_row_marked = np.all(state.row_status == 1)
-        all_col_marked = np.all(state.col_status == 1)
-
-        if not (all_row_marked or all_col_marked):
-            return self.get_random_action(state)
-        elif all_row_marked:
-            return self.get_random_col_action(state)
-        else:
-            return self.get_random_row_action(state)
-
-    def get_random_action(self, state: GameState) -> GameAction:
-        if random.random() < 0.5:
-            return self.get_random_row_action(state)
-        else:
-            return self.get_random_col_action(state)
+    """
+    Plays a uniformly random free edge.
 
-    def get_random_row_action(self, state: GameState) -> GameAction:
-        position = self.get_random_position_with_zero_value(state.row_status)
-        return GameAction("row", position)
+    The free edges are kept in a FreeEdgeIndex across moves, updated with
+    the edges marked since the last call, so a move costs O(1) however
+    full the board is.
+    """
 
-    def get_random_position_with_zero_value(self, matrix: np.ndarray):
-        [ny, nx] = matrix.shape
+    def __init__(self):
+        self.free_index: Optional[FreeEdgeIndex] = None
+        self.board: Optional[BitBoard] = None
 
-        x = -1
-        y = -1
-        valid = False
-
-        while not valid:
-            x = random.randrange(0, nx)
-            y = random.randrange(0, ny)
-            valid = matrix[y, x] == 0
-
-        return (x, y)
-
-    def get_random_col_action(self, state: GameState) -> GameAction:
-        position = self.get_random_position_with_zero_value(state.col_status)
-        return GameAction("col", position)
+    def get_action(self, state: GameState) -> GameAction:
+        board = BitBoard.from_state(state)
+        self.update_index(board)
+        return board.layout.edge_actions[self.free_index.sample()]
+
+    # == Mark the edges played since the last move, or rebuild for a new game
+    def update_index(self, board: BitBoard):
+        last = self.board
+        if last is None or last.layout is not board.layout or last.edges & ~board.edges:
+            self.free_index = FreeEdgeIndex(board.layout, board.edges)
+        else:
+            played = board.edges & ~last.edges
+            while played:
+                edge = (played & -played).bit_length() - 1
+                self.free_index.remove(edge)
+                played &= played - 1
+        self.board = board
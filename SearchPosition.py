@@ -0,0 +1,133 @@
+from typing import Iterator, List, Optional, Tuple, Union
+from BitBoard import BitBoard, iterate_bits
+from FreeEdgeIndex import FreeEdgeIndex
+from GameAction import GameAction
+from TranspositionTable import ZobristKeys
+
+
+class SearchPosition:
+    """
+    Mutable game position for search.
+
+    make(edge) marks an edge in place, updating the box side counters,
+    the box owners, the scores, the turn, the index of free edges and (if
+    zobrist is given) the Zobrist key, and pushes what is needed to undo
+    it. unmake() reverts the last make(). Read access mirrors BitBoard,
+    so a SearchPosition can be passed wherever a BitBoard is only
+    inspected; use to_board() to take an immutable snapshot.
+    """
+
+    def __init__(self, board: BitBoard, zobrist: Optional[ZobristKeys] = None):
+        layout = board.layout
+        self.layout = layout
+        self.edges = board.edges
+        self.player1_boxes = board.player1_boxes
+        self.player2_boxes = board.player2_boxes
+        self.player1_turn = board.player1_turn
+        self.player1_score = board.player1_boxes.bit_count()
+        self.player2_score = board.player2_boxes.bit_count()
+        self.box_sides: List[int] = [
+            (board.edges & mask).bit_count() for mask in layout.box_masks
+        ]
+        self.free_index = FreeEdgeIndex(layout, board.edges)
+
+        self.zobrist = zobrist
+        self.key = zobrist.hash(board) if zobrist is not None else 0
+
+        # == (edge, scored boxes, key before the move)
+        self.undo_stack: List[Tuple[int, int, int]] = []
+
+    # == Move application
+    def make(self, edge: int) -> bool:
+        """
+        Marks edge and returns True if it completed a box.
+        """
+        self.edges |= 1 << edge
+        self.free_index.remove(edge)
+
+        scored = 0
+        box_sides = self.box_sides
+        for box in self.layout.edge_boxes[edge]:
+            box_sides[box] += 1
+            if box_sides[box] == 4:
+                scored |= 1 << box
+
+        self.undo_stack.append((edge, scored, self.key))
+        zobrist = self.zobrist
+        if zobrist is not None:
+            self.key ^= zobrist.edge_keys[edge]
+
+        if not scored:
+            self.player1_turn = not self.player1_turn
+            if zobrist is not None:
+                self.key ^= zobrist.side_key
+            return False
+
+        count = scored.bit_count()
+        if self.player1_turn:
+            self.player1_boxes |= scored
+            self.player1_score += count
+            if zobrist is not None:
+                for box in iterate_bits(scored):
+                    self.key ^= zobrist.player1_box_keys[box]
+        else:
+            self.player2_boxes |= scored
+            self.player2_score += count
+            if zobrist is not None:
+                for box in iterate_bits(scored):
+                    self.key ^= zobrist.player2_box_keys[box]
+        return True
+
+    def make_action(self, action: GameAction) -> bool:
+        return self.make(self.layout.edge_of(action))
+
+    def unmake(self):
+        edge, scored, key = self.undo_stack.pop()
+        self.edges ^= 1 << edge
+        self.free_index.add(edge)
+        self.key = key
+
+        box_sides = self.box_sides
+        for box in self.layout.edge_boxes[edge]:
+            box_sides[box] -= 1
+
+        if not scored:
+            self.player1_turn = not self.player1_turn
+            return
+
+        count = scored.bit_count()
+        if self.player1_turn:
+            self.player1_boxes ^= scored
+            self.player1_score -= count
+        else:
+            self.player2_boxes ^= scored
+            self.player2_score -= count
+
+    # == Queries, same as BitBoard
+    def to_board(self) -> BitBoard:
+        return BitBoard(self.edges, self.player1_boxes, self.player2_boxes, self.player1_turn, self.layout)
+
+    def free_edges(self) -> int:
+        return self.layout.full_edges & ~self.edges
+
+    # == Unlike BitBoard, in the order of the free edge index
+    def legal_edges(self) -> Iterator[int]:
+        return iter(self.free_index)
+
+    def is_terminal(self) -> bool:
+        return self.edges == self.layout.full_edges
+
+    def box_side_count(self, box: int) -> int:
+        return self.box_sides[box]
+
+    # == Uniformly random free edge in O(1)
+    def random_edge(self) -> int:
+        return self.free_index.sample()
+
+    @property
+    def ply(self) -> int:
+        return len(self.undo_stack)
+
+
+# == Anything search code may inspect as a position
+Position = Union[BitBoard, SearchPosition]
@@ -0,0 +1,151 @@
+from functools import lru_cache
+from typing import Callable, List, Tuple
+from BitBoard import BitBoard, BoardLayout, build_chunk_tables, apply_chunk_tables
+from GameAction import GameAction
+from GameState import GameState
+
+# == Dot transforms, (x, y, width, height) -> (x, y)
+DotTransform = Callable[[int, int, int, int], Tuple[int, int]]
+
+RECTANGLE_TRANSFORMS: List[DotTransform] = [
+    lambda x, y, w, h: (x, y),
+    lambda x, y, w, h: (w - x, y),
+    lambda x, y, w, h: (x, h - y),
+    lambda x, y, w, h: (w - x, h - y),
+]
+
+SQUARE_TRANSFORMS: List[DotTransform] = RECTANGLE_TRANSFORMS + [
+    lambda x, y, w, h: (y, x),
+    lambda x, y, w, h: (h - y, x),
+    lambda x, y, w, h: (y, w - x),
+    lambda x, y, w, h: (h - y, w - x),
+]
+
+
+class SymmetryTables:
+    """
+    Edge and box permutations of every symmetry of a board layout: the
+    8 dihedral symmetries of a square board, or the 4 of a rectangle.
+
+    Transform t maps a position to an equivalent one, canonicalize()
+    picks the smallest image of a position. Moves found in the canonical
+    frame are mapped back with restore_edge() / restore_action().
+    Use SymmetryTables.get(layout) to obtain a shared instance.
+    """
+
+    def __init__(self, layout: BoardLayout):
+        self.layout = layout
+        transforms = SQUARE_TRANSFORMS if layout.rows == layout.cols else RECTANGLE_TRANSFORMS
+
+        self.edge_perms: List[Tuple[int, ...]] = []
+        self.box_perms: List[Tuple[int, ...]] = []
+        for transform in transforms:
+            self.edge_perms.append(tuple(
+                self.transform_edge_geometry(transform, edge)
+                for edge in range(layout.num_edges)
+            ))
+            self.box_perms.append(tuple(
+                self.transform_box_geometry(transform, box)
+                for box in range(layout.num_boxes)
+            ))
+
+        self.inverse_edge_perms: List[Tuple[int, ...]] = []
+        for perm in self.edge_perms:
+            inverse = [0] * len(perm)
+            for edge, image in enumerate(perm):
+                inverse[image] = edge
+            self.inverse_edge_perms.append(tuple(inverse))
+
+        # == Lookup tables so a whole mask is permuted with a few chunk lookups
+        self.edge_tables = [
+            build_chunk_tables([1 << image for image in perm]) for perm in self.edge_perms
+        ]
+        self.box_tables = [
+            build_chunk_tables([1 << image for image in perm]) for perm in self.box_perms
+        ]
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get(layout: BoardLayout) -> "SymmetryTables":
+        return SymmetryTables(layout)
+
+    @property
+    def count(self) -> int:
+        return len(self.edge_perms)
+
+    def transform_edge_geometry(self, transform: DotTransform, edge: int) -> int:
+        layout = self.layout
+        action = layout.edge_actions[edge]
+        x, y = action.position
+        x2, y2 = (x + 1, y) if action.action_type == "row" else (x, y + 1)
+
+        ax, ay = transform(x, y, layout.cols, layout.rows)
+        bx, by = transform(x2, y2, layout.cols, layout.rows)
+        if ay == by:
+            return layout.row_edge(min(ax, bx), ay)
+        return layout.col_edge(ax, min(ay, by))
+
+    def transform_box_geometry(self, transform: DotTransform, box: int) -> int:
+        layout = self.layout
+        x, y = box % layout.cols, box // layout.cols
+        ax, ay = transform(x, y, layout.cols, layout.rows)
+        bx, by = transform(x + 1, y + 1, layout.cols, layout.rows)
+        return min(ay, by) * layout.cols + min(ax, bx)
+
+    # == Position transforms
+    def transform_board(self, board: BitBoard, transform: int) -> BitBoard:
+        box_tables = self.box_tables[transform]
+        return BitBoard(
+            apply_chunk_tables(self.edge_tables[transform], board.edges),
+            apply_chunk_tables(box_tables, board.player1_boxes),
+            apply_chunk_tables(box_tables, board.player2_boxes),
+            board.player1_turn,
+            board.layout,
+        )
+
+    def canonicalize(self, board: BitBoard) -> Tuple[BitBoard, int]:
+        """
+        Returns the canonical form of board and the transform that maps
+        board onto it.
+        """
+        best = (board.edges, board.player1_boxes, board.player2_boxes)
+        best_transform = 0
+        for transform in range(1, self.count):
+            edges = apply_chunk_tables(self.edge_tables[transform], board.edges)
+            if edges > best[0]:
+                continue
+            box_tables = self.box_tables[transform]
+            image = (
+                edges,
+                apply_chunk_tables(box_tables, board.player1_boxes),
+                apply_chunk_tables(box_tables, board.player2_boxes),
+            )
+            if image < best:
+                best = image
+                best_transform = transform
+
+        if best_transform == 0:
+            return board, 0
+        return BitBoard(*best, board.player1_turn, board.layout), best_transform
+
+    # == Move transforms
+    def transform_edge(self, edge: int, transform: int) -> int:
+        return self.edge_perms[transform][edge]
+
+    def restore_edge(self, edge: int, transform: int) -> int:
+        return self.inverse_edge_perms[transform][edge]
+
+    def restore_action(self, action: GameAction, transform: int) -> GameAction:
+        layout = self.layout
+        return layout.edge_actions[self.restore_edge(layout.edge_of(action), transform)]
+
+
+def canonicalize_state(state: GameState) -> Tuple[GameState, int]:
+    """
+    Canonical form of a GameState and the transform used; map an action
+    of the canonical state back with
+    SymmetryTables.get(layout).restore_action(action, transform).
+    """
+    board = BitBoard.from_state(state)
+    canonical, transform = SymmetryTables.get(board.layout).canonicalize(board)
+    return canonical.to_state(), transform
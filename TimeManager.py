@@ -0,0 +1,136 @@
+from time import time
+from typing import Optional
+from SearchPosition import Position
+
+# == Nodes searched between two reads of the clock, a power of two
+CLOCK_CHECK_INTERVAL = 128
+CLOCK_CHECK_MASK = CLOCK_CHECK_INTERVAL - 1
+
+# == Share of the budget of a move, by phase
+CAPTURE_FACTOR = 0.1
+ENDGAME_FACTOR = 0.5
+CRITICAL_FACTOR = 2.0
+
+# == Positions with at most this many safe moves decide the chain parity
+CRITICAL_SAFE_MOVES = 8
+
+# == Soft limit extension when the best move changed between two iterations
+INSTABILITY_FACTOR = 1.5
+
+# == Expected time of an iteration relative to the previous one
+ITERATION_GROWTH = 2.0
+
+# == Largest share of the remaining game time spent on one move
+MAX_GAME_SHARE = 0.5
+
+
+class TimeManager:
+    """
+    Decides how long a bot thinks about a move.
+
+    max_move_time: hard limit of a move in seconds
+    game_time: total thinking time of the bot for a game, None to only
+        use max_move_time
+    increment: seconds added to the game time after every move
+
+    Every move gets a soft limit, its share of the budget scaled by the
+    difficulty of the position, and a hard limit. A move with a single
+    legal edge takes no time. Iterative deepening stops once the soft
+    limit is reached, or when the next iteration is not expected to end
+    before the hard limit; a best move that changes between iterations
+    pushes the soft limit back. The budget is the remaining game time
+    divided by the moves left to the bot, or half of max_move_time
+    without a game time.
+    """
+
+    def __init__(
+        self,
+        max_move_time: float = 4.995,
+        game_time: Optional[float] = None,
+        increment: float = 0.0,
+    ):
+        self.max_move_time = max_move_time
+        self.game_time = game_time
+        self.increment = increment
+        self.remaining = game_time
+        self.free_edges = -1
+
+        self.start_time = 0.0
+        self.soft_deadline = 0.0
+        self.hard_deadline = 0.0
+        self.last_iteration_time = 0.0
+
+    # == Difficulty of a position as a factor of the budget of a move
+    def get_difficulty(self, board: Position) -> float:
+        layout = board.layout
+        edges = board.edges
+        free_edges = layout.full_edges & ~edges
+        if free_edges.bit_count() <= 1:
+            return 0.0
+
+        capture_mask = 0
+        unsafe_mask = 0
+        for mask in layout.box_masks:
+            count = (edges & mask).bit_count()
+            if count == 3:
+                capture_mask |= mask
+            elif count == 2:
+                unsafe_mask |= mask
+        safe_moves = (free_edges & ~capture_mask & ~unsafe_mask).bit_count()
+
+        # Boxes offered before the endgame are taken anyway
+        if free_edges & capture_mask and safe_moves > 0:
+            return CAPTURE_FACTOR
+        if safe_moves == 0:
+            return ENDGAME_FACTOR
+        if safe_moves <= CRITICAL_SAFE_MOVES:
+            return CRITICAL_FACTOR
+        return 1.0
+
+    def start_move(self, board: Position) -> float:
+        """
+        Starts the clock of a move and returns its hard deadline.
+        """
+        self.start_time = time()
+        self.last_iteration_time = 0.0
+
+        free_edges = (board.layout.full_edges & ~board.edges).bit_count()
+        if free_edges > self.free_edges:
+            # More free edges than last time, a new game
+            self.remaining = self.game_time
+        self.free_edges = free_edges
+
+        hard_limit = self.max_move_time
+        if self.remaining is None:
+            budget = self.max_move_time / CRITICAL_FACTOR
+        else:
+            moves_left = max(1, (free_edges + 1) // 2)
+            budget = self.remaining / moves_left + self.increment
+            hard_limit = min(hard_limit, self.remaining * MAX_GAME_SHARE + self.increment)
+
+        soft_limit = min(budget * self.get_difficulty(board), hard_limit)
+        self.soft_deadline = self.start_time + soft_limit
+        self.hard_deadline = self.start_time + hard_limit
+        return self.hard_deadline
+
+    def continue_search(self, best_changed: bool) -> bool:
+        """
+        Called after every completed iteration, returns whether to start
+        the next one.
+        """
+        now = time()
+        iteration_time = now - self.start_time - self.last_iteration_time
+        self.last_iteration_time = now - self.start_time
+
+        if best_changed:
+            self.soft_deadline = min(
+                self.hard_deadline,
+                self.soft_deadline + (self.soft_deadline - self.start_time) * (INSTABILITY_FACTOR - 1),
+            )
+        if now >= self.soft_deadline:
+            return False
+        return now + iteration_time * ITERATION_GROWTH < self.hard_deadline
+
+    def end_move(self):
+        if self.remaining is not None:
+            self.remaining += self.increment - (time() - self.start_time)
@@ -0,0 +1,176 @@
+from functools import lru_cache
+from typing import NamedTuple, Optional, List, Dict
+from BitBoard import BitBoard, BoardLayout, iterate_bits, build_chunk_tables, apply_chunk_tables
+import random
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+ZOBRIST_SEED = 20221018
+
+
+class ZobristKeys:
+    """
+    Random 64-bit keys for every edge, every (box, owner) pair and the
+    side to move of a board layout.
+
+    The hash of a position is the xor of the keys of its marked edges,
+    its owned boxes and, when it is player 1 turn, the side key. Use
+    ZobristKeys.get(layout) to obtain a shared instance.
+    """
+
+    def __init__(self, layout: BoardLayout, seed: int = ZOBRIST_SEED):
+        generator = random.Random(seed + layout.rows * 1000 + layout.cols)
+        self.layout = layout
+        self.edge_keys = [generator.getrandbits(64)
+                          for _ in range(layout.num_edges)]
+        self.player1_box_keys = [generator.getrandbits(64)
+                                 for _ in range(layout.num_boxes)]
+        self.player2_box_keys = [generator.getrandbits(64)
+                                 for _ in range(layout.num_boxes)]
+        self.side_key = generator.getrandbits(64)
+
+        self.edge_tables = build_chunk_tables(self.edge_keys)
+        self.player1_box_tables = build_chunk_tables(self.player1_box_keys)
+        self.player2_box_tables = build_chunk_tables(self.player2_box_keys)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get(layout: BoardLayout) -> "ZobristKeys":
+        return ZobristKeys(layout)
+
+    # == Full hash, computed from precomputed per-byte tables
+    def hash(self, board: BitBoard) -> int:
+        key = self.side_key if board.player1_turn else 0
+        key ^= apply_chunk_tables(self.edge_tables, board.edges)
+        key ^= apply_chunk_tables(self.player1_box_tables, board.player1_boxes)
+        key ^= apply_chunk_tables(self.player2_box_tables, board.player2_boxes)
+        return key
+
+    # == Incremental hash of `child = board.get_result(edge)`
+    def update(self, key: int, board: BitBoard, edge: int, child: BitBoard) -> int:
+        key ^= self.edge_keys[edge]
+        if child.player1_turn != board.player1_turn:
+            return key ^ self.side_key
+
+        # A box was scored, the turn is kept
+        if child.player1_turn:
+            for box in iterate_bits(child.player1_boxes ^ board.player1_boxes):
+                key ^= self.player1_box_keys[box]
+        else:
+            for box in iterate_bits(child.player2_boxes ^ board.player2_boxes):
+                key ^= self.player2_box_keys[box]
+        return key
+
+
+class TTEntry(NamedTuple):
+    """
+    key: full Zobrist key of the position
+    depth: remaining search depth the value was computed with
+    value: minimax value
+    bound: EXACT, LOWER_BOUND or UPPER_BOUND
+    best_move: edge that produced the value, or None
+    generation: search the entry was stored in
+    """
+
+    key: int
+    depth: int
+    value: float
+    bound: int
+    best_move: Optional[int]
+    generation: int
+
+
+class TranspositionTable:
+    """
+    Bounded hash table of searched positions.
+
+    Every bucket has two slots: a depth-preferred slot, which keeps the
+    deepest entry of the current search, and an always-replace slot,
+    which takes everything else. The table survives between iterations
+    and between moves; call new_search() at the start of each move so
+    entries of older searches may be evicted from depth-preferred slots.
+    resume_search(generation) makes an earlier search current again,
+    which keeps its entries and ages out every other generation.
+    """
+
+    def __init__(self, size: int = 1 << 17):
+        # == Round size up to a power of two so the index is a mask
+        buckets = 1
+        while buckets < size:
+            buckets <<= 1
+        self.mask = buckets - 1
+        self.generation = 0
+        self.last_generation = 0
+        self.depth_slots: List[Optional[TTEntry]] = [None] * buckets
+        self.always_slots: List[Optional[TTEntry]] = [None] * buckets
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def clear(self):
+        buckets = self.mask + 1
+        self.depth_slots = [None] * buckets
+        self.always_slots = [None] * buckets
+        self.generation = 0
+
+    def new_search(self) -> int:
+        self.last_generation += 1
+        self.generation = self.last_generation
+        return self.generation
+
+    def resume_search(self, generation: int):
+        self.generation = generation
+
+    def probe(self, key: int) -> Optional[TTEntry]:
+        index = key & self.mask
+
+        entry = self.depth_slots[index]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+
+        entry = self.always_slots[index]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        return None
+
+    def store(self, key: int, depth: int, value: float, bound: int, best_move: Optional[int] = None):
+        index = key & self.mask
+        entry = TTEntry(key, depth, value, bound, best_move, self.generation)
+        self.stores += 1
+
+        current = self.depth_slots[index]
+        if (
+            current is None
+            or current.key == key
+            or current.generation != self.generation
+            or depth >= current.depth
+        ):
+            if current is not None and current.key != key:
+                self.overwrites += 1
+                # The displaced entry is still worth keeping around
+                self.always_slots[index] = current
+            self.depth_slots[index] = entry
+            return
+
+        current = self.always_slots[index]
+        if current is not None and current.key != key:
+            self.overwrites += 1
+        self.always_slots[index] = entry
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "overwrites": self.overwrites,
+        }
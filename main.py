@@ -6,11 +6,14 @@
 from tkinter import *
 import numpy as np
 from Bot import Bot
-from typing import Optional
+from typing import List, Optional
+from GameAction import GameAction
+from GameEngine import GameEngine
 from GameState import GameState
 from RandomBot import RandomBot
 from AdversarialSearchBot import AdversarialSearchBot
 from LocalSearchBot import LocalSearchBot
+from threading import Thread
 from time import time
 
 # == Tkinter Config
@@ -29,7 +32,9 @@ edge_width = 0.1 * size_of_board / number_of_dots
 distance_between_dots = size_of_board / (number_of_dots)
 
 BOT_TURN_INTERVAL_MS = 100
+BOT_POLL_INTERVAL_MS = 50
 LEFT_CLICK = "<Button-1>"
+RESTART_KEY = "<Key-r>"
 
 
 class Dots_and_Boxes:
@@ -43,27 +48,40 @@ class Dots_and_Boxes:
             self.window, width=size_of_board, height=size_of_board)
         self.canvas.pack()
         self.player1_starts = True
-        self.refresh_board()
+        self.create_board()
+
+        # Bot moves are computed in a worker thread, the game id tells stale results apart
+        self.game_id = 0
+        self.bot_thread: Optional[Thread] = None
+        self.thinking_bot: Optional[Bot] = None
+        self.bot_action: Optional[GameAction] = None
+        self.bot_error: Optional[BaseException] = None
+        # Workers of cancelled turns run out on their own, their results are ignored
+        self.abandoned_threads: List[Thread] = []
+        self.window.bind(RESTART_KEY, self.restart)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
 
         self.bot1 = bot1
         self.bot2 = bot2
         self.play_again()
 
     def play_again(self):
-        self.refresh_board()
-        self.board_status = np.zeros(
-            shape=(number_of_dots - 1, number_of_dots - 1))
-        self.row_status = np.zeros(shape=(number_of_dots, number_of_dots - 1))
-        self.col_status = np.zeros(shape=(number_of_dots - 1, number_of_dots))
+        self.stop_pondering()
+        self.cancel_bot_turn()
+        self.game_id += 1
+        self.reset_canvas()
         self.pointsScored = False
 
         # Input from user in form of clicks
         self.player1_starts = not self.player1_starts
         self.player1_turn = not self.player1_starts
-        self.reset_board = False
-        self.turntext_handle = []
 
-        self.already_marked_boxes = []
+        # Game rules live in the headless engine, its arrays are updated in place
+        self.engine = GameEngine(number_of_dots, self.player1_turn)
+        self.board_status = self.engine.board_status
+        self.row_status = self.engine.row_status
+        self.col_status = self.engine.col_status
+        self.reset_board = False
         self.display_turn_text()
 
         self.turn()
@@ -71,6 +89,14 @@ class Dots_and_Boxes:
     def mainloop(self):
         self.window.mainloop()
 
+    def restart(self, event=None):
+        self.play_again()
+
+    def close(self):
+        self.stop_pondering()
+        self.cancel_bot_turn()
+        self.window.destroy()
+
     # ------------------------------------------------------------------
     # Logical Functions:
     # The modules required to carry out game logic
@@ -113,63 +139,40 @@ class Dots_and_Boxes:
     def pointScored(self):
         self.pointsScored = True
 
-    def mark_box(self):
-        boxes = np.argwhere(self.board_status == -4)
-        for box in boxes:
-            if list(box) not in self.already_marked_boxes and list(box) != []:
-                self.already_marked_boxes.append(list(box))
-                color = player1_color_light
-                self.shade_box(box, color)
-
-        boxes = np.argwhere(self.board_status == 4)
-        for box in boxes:
-            if list(box) not in self.already_marked_boxes and list(box) != []:
-                self.already_marked_boxes.append(list(box))
-                color = player2_color_light
-                self.shade_box(box, color)
-
-    def update_board(self, type, logical_position):
+    def mark_box(self, type, logical_position):
+        # Only the boxes next to the new edge can have been completed
         x = logical_position[0]
         y = logical_position[1]
-        val = 1
-        playerModifier = 1
-        if self.player1_turn:
-            playerModifier = -1
-
-        if y < (number_of_dots - 1) and x < (number_of_dots - 1):
-            self.board_status[y][x] = (
-                abs(self.board_status[y][x]) + val
-            ) * playerModifier
-            if abs(self.board_status[y][x]) == 4:
-                self.pointScored()
-
+        boxes = [(y, x)]
         if type == "row":
-            self.row_status[y][x] = 1
-            if y >= 1:
-                self.board_status[y - 1][x] = (
-                    abs(self.board_status[y - 1][x]) + val
-                ) * playerModifier
-                if abs(self.board_status[y - 1][x]) == 4:
-                    self.pointScored()
+            boxes.append((y - 1, x))
+        else:
+            boxes.append((y, x - 1))
 
-        elif type == "col":
-            self.col_status[y][x] = 1
-            if x >= 1:
-                self.board_status[y][x - 1] = (
-                    abs(self.board_status[y][x - 1]) + val
-                ) * playerModifier
-                if abs(self.board_status[y][x - 1]) == 4:
-                    self.pointScored()
+        [ny, nx] = self.board_status.shape
+        for box in boxes:
+            if 0 <= box[0] < ny and 0 <= box[1] < nx and not self.marked_boxes[box]:
+                if self.board_status[box] == -4:
+                    self.marked_boxes[box] = True
+                    self.shade_box(box, player1_color_light)
+                elif self.board_status[box] == 4:
+                    self.marked_boxes[box] = True
+                    self.shade_box(box, player2_color_light)
+
+    def update_board(self, type, logical_position):
+        action = GameAction(type, (logical_position[0], logical_position[1]))
+        if self.engine.apply(action):
+            self.pointScored()
 
     def is_gameover(self):
-        return (self.row_status == 1).all() and (self.col_status == 1).all()
+        return self.engine.is_gameover()
 
     # ------------------------------------------------------------------
     # Drawing Functions:
     # The modules required to draw required game based object on canvas
     # ------------------------------------------------------------------
 
-    def make_edge(self, type, logical_position):
+    def edge_coordinates(self, type, logical_position):
         if type == "row":
             start_x = (
                 distance_between_dots / 2 +
@@ -193,13 +196,15 @@ class Dots_and_Boxes:
             )
             end_x = start_x
 
+        return start_x, start_y, end_x, end_y
+
+    def make_edge(self, type, logical_position):
         if self.player1_turn:
             color = player1_color
         else:
             color = player2_color
-        self.canvas.create_line(
-            start_x, start_y, end_x, end_y, fill=color, width=edge_width
-        )
+        handle = self.edge_handles[type][logical_position[1]][logical_position[0]]
+        self.canvas.itemconfigure(handle, fill=color, state="normal")
 
     def display_gameover(self):
         player1_score = len(np.argwhere(self.board_status == -4))
@@ -216,13 +221,14 @@ class Dots_and_Boxes:
             text = "Its a tie"
             color = "gray"
 
-        self.canvas.delete("all")
+        self.canvas.itemconfigure("board", state="hidden")
         self.canvas.create_text(
             size_of_board / 2,
             size_of_board / 3,
             font="cmr 60 bold",
             fill=color,
             text=text,
+            tags="gameover",
         )
 
         score_text = "Scores \n"
@@ -232,6 +238,7 @@ class Dots_and_Boxes:
             font="cmr 40 bold",
             fill=Green_color,
             text=score_text,
+            tags="gameover",
         )
 
         score_text = "Player 1 : " + str(player1_score) + "\n"
@@ -243,6 +250,7 @@ class Dots_and_Boxes:
             font="cmr 30 bold",
             fill=Green_color,
             text=score_text,
+            tags="gameover",
         )
         self.reset_board = True
 
@@ -253,9 +261,11 @@ class Dots_and_Boxes:
             font="cmr 20 bold",
             fill="gray",
             text=score_text,
+            tags="gameover",
         )
 
-    def refresh_board(self):
+    def create_board(self):
+        # Every item is created once, moves only change the items they touch
         for i in range(number_of_dots):
             x = i * distance_between_dots + distance_between_dots / 2
             self.canvas.create_line(
@@ -265,6 +275,7 @@ class Dots_and_Boxes:
                 size_of_board - distance_between_dots / 2,
                 fill="gray",
                 dash=(2, 2),
+                tags="board",
             )
             self.canvas.create_line(
                 distance_between_dots / 2,
@@ -273,8 +284,40 @@ class Dots_and_Boxes:
                 x,
                 fill="gray",
                 dash=(2, 2),
+                tags="board",
             )
 
+        self.box_handles = [
+            [0] * (number_of_dots - 1) for _ in range(number_of_dots - 1)]
+        for y in range(number_of_dots - 1):
+            for x in range(number_of_dots - 1):
+                start_x = (
+                    distance_between_dots / 2 + x *
+                    distance_between_dots + edge_width / 2
+                )
+                start_y = (
+                    distance_between_dots / 2 + y *
+                    distance_between_dots + edge_width / 2
+                )
+                end_x = start_x + distance_between_dots - edge_width
+                end_y = start_y + distance_between_dots - edge_width
+                self.box_handles[y][x] = self.canvas.create_rectangle(
+                    start_x, start_y, end_x, end_y, outline="", tags=("board", "box")
+                )
+
+        self.edge_handles = {
+            "row": [[0] * (number_of_dots - 1) for _ in range(number_of_dots)],
+            "col": [[0] * number_of_dots for _ in range(number_of_dots - 1)],
+        }
+        for type, handles in self.edge_handles.items():
+            for y, row in enumerate(handles):
+                for x in range(len(row)):
+                    row[x] = self.canvas.create_line(
+                        *self.edge_coordinates(type, [x, y]),
+                        width=edge_width,
+                        tags=("board", "edge"),
+                    )
+
         for i in range(number_of_dots):
             for j in range(number_of_dots):
                 start_x = i * distance_between_dots + distance_between_dots / 2
@@ -286,40 +329,47 @@ class Dots_and_Boxes:
                     end_x + dot_width / 2,
                     fill=dot_color,
                     outline=dot_color,
+                    tags="board",
                 )
 
-    def display_turn_text(self):
-        text = "Next turn: "
-        if self.player1_turn:
-            text += "Player1"
-            color = player1_color
-        else:
-            text += "Player2"
-            color = player2_color
-
-        self.canvas.delete(self.turntext_handle)
         self.turntext_handle = self.canvas.create_text(
-            size_of_board - 5 * len(text),
+            size_of_board - 5 * len("Next turn: Player1"),
             size_of_board - distance_between_dots / 8,
             font="cmr 15 bold",
-            text=text,
-            fill=color,
+            tags="board",
         )
+        self.thinkingtext_handle = self.canvas.create_text(
+            distance_between_dots / 8,
+            size_of_board - distance_between_dots / 8,
+            anchor="w",
+            font="cmr 12",
+            fill="gray",
+            tags="board",
+        )
+
+    def reset_canvas(self):
+        self.canvas.delete("gameover")
+        self.canvas.itemconfigure("board", state="normal")
+        self.canvas.itemconfigure("edge", state="hidden")
+        self.canvas.itemconfigure("box", state="hidden")
+        self.canvas.itemconfigure(self.thinkingtext_handle, text="")
+        self.marked_boxes = np.zeros(
+            (number_of_dots - 1, number_of_dots - 1), dtype=bool)
+
+    def display_thinking_text(self, bot: Bot):
+        text = "Thinking..."
+        depth = getattr(bot, "search_depth", None)
+        if depth is not None:
+            text += " depth " + str(depth)
+        nodes = getattr(bot, "nodes", None)
+        if nodes is not None:
+            text += ", " + str(nodes) + " nodes"
+
+        self.canvas.itemconfigure(self.thinkingtext_handle, text=text)
 
     def shade_box(self, box, color):
-        start_x = (
-            distance_between_dots / 2 + box[1] *
-            distance_between_dots + edge_width / 2
-        )
-        start_y = (
-            distance_between_dots / 2 + box[0] *
-            distance_between_dots + edge_width / 2
-        )
-        end_x = start_x + distance_between_dots - edge_width
-        end_y = start_y + distance_between_dots - edge_width
-        self.canvas.create_rectangle(
-            start_x, start_y, end_x, end_y, fill=color, outline=""
-        )
+        self.canvas.itemconfigure(
+            self.box_handles[box[0]][box[1]], fill=color, state="normal")
 
     def display_turn_text(self):
         text = "Next turn: "
@@ -330,14 +380,7 @@ class Dots_and_Boxes:
             text += "Player2"
             color = player2_color
 
-        self.canvas.delete(self.turntext_handle)
-        self.turntext_handle = self.canvas.create_text(
-            size_of_board - 5 * len(text),
-            size_of_board - distance_between_dots / 8,
-            font="cmr 15 bold",
-            text=text,
-            fill=color,
-        )
+        self.canvas.itemconfigure(self.turntext_handle, text=text, fill=color)
 
     def click(self, event):
         if not self.reset_board:
@@ -347,17 +390,16 @@ class Dots_and_Boxes:
             )
             self.update(valid_input, logical_position)
         else:
-            self.canvas.delete("all")
             self.play_again()
             self.reset_board = False
 
     def update(self, valid_input, logical_position):
         if valid_input and not self.is_grid_occupied(logical_position, valid_input):
             self.window.unbind(LEFT_CLICK)
+            self.stop_pondering()
             self.update_board(valid_input, logical_position)
             self.make_edge(valid_input, logical_position)
-            self.mark_box()
-            self.refresh_board()
+            self.mark_box(valid_input, logical_position)
             self.player1_turn = (
                 not self.player1_turn if not self.pointsScored else self.player1_turn
             )
@@ -375,20 +417,92 @@ class Dots_and_Boxes:
         current_bot = self.bot1 if self.player1_turn else self.bot2
         if current_bot is None:
             self.window.bind(LEFT_CLICK, self.click)
+
+            # A bot waiting for a human keeps thinking on the human's time
+            waiting_bot = self.bot2 if self.player1_turn else self.bot1
+            if waiting_bot is not None and not self.is_bot_busy():
+                waiting_bot.ponder(self.get_state())
         else:
-            self.window.after(BOT_TURN_INTERVAL_MS, self.bot_turn, current_bot)
-
-    def bot_turn(self, bot: Bot):
-        action = bot.get_action(
-            GameState(
-                self.board_status.copy(),
-                self.row_status.copy(),
-                self.col_status.copy(),
-                self.player1_turn,
-            )
+            self.window.after(BOT_TURN_INTERVAL_MS,
+                              self.bot_turn, current_bot, self.game_id)
+
+    def stop_pondering(self):
+        for bot in (self.bot1, self.bot2):
+            if bot is not None:
+                bot.stop_pondering()
+
+    def get_state(self) -> GameState:
+        return GameState(
+            self.board_status.copy(),
+            self.row_status.copy(),
+            self.col_status.copy(),
+            self.player1_turn,
         )
+
+    def bot_turn(self, bot: Bot, game_id: int):
+        if game_id != self.game_id:
+            return
+
+        # A bot is never used by two threads, wait for cancelled turns to end
+        if self.is_bot_busy():
+            self.window.after(BOT_POLL_INTERVAL_MS, self.bot_turn, bot, game_id)
+            return
+
+        self.bot_action = None
+        self.bot_error = None
+        self.thinking_bot = bot
+        self.bot_thread = Thread(
+            target=self.run_bot, args=(bot, self.get_state()), daemon=True)
+        self.bot_thread.start()
+        self.window.after(BOT_POLL_INTERVAL_MS, self.poll_bot, bot, game_id)
+
+    def run_bot(self, bot: Bot, state: GameState):
+        # Runs in the worker thread, it must not touch Tk
+        try:
+            self.bot_action = bot.get_action(state)
+        except Exception as error:
+            self.bot_error = error
+
+    def poll_bot(self, bot: Bot, game_id: int):
+        if game_id != self.game_id:
+            return
+
+        if self.bot_thread.is_alive():
+            self.display_thinking_text(bot)
+            self.window.after(BOT_POLL_INTERVAL_MS,
+                              self.poll_bot, bot, game_id)
+            return
+
+        self.bot_thread = None
+        message = ""
+        action = self.bot_action
+        if action is None or self.is_grid_occupied(action.position, action.action_type):
+            # == A failed or illegal bot move is replaced by a legal one, so the game goes on
+            reason = type(self.bot_error).__name__ if self.bot_error is not None else "illegal move"
+            message = f"{type(bot).__name__} failed ({reason}), fallback move played"
+            action = self.get_fallback_action()
+        self.canvas.itemconfigure(self.thinkingtext_handle, text=message)
         self.update(action.action_type, action.position)
 
+    def get_fallback_action(self) -> GameAction:
+        for action_type, matrix in (("row", self.row_status), ("col", self.col_status)):
+            free = np.argwhere(matrix == 0)
+            if len(free):
+                y, x = free[0]
+                return GameAction(action_type, (int(x), int(y)))
+        raise ValueError("no free edge left")
+
+    def cancel_bot_turn(self):
+        # The worker is not joined on the Tk thread, it stops at the next clock check of the bot
+        if self.bot_thread is not None and self.bot_thread.is_alive():
+            self.thinking_bot.cancel()
+            self.abandoned_threads.append(self.bot_thread)
+        self.bot_thread = None
+
+    def is_bot_busy(self) -> bool:
+        self.abandoned_threads = [thread for thread in self.abandoned_threads if thread.is_alive()]
+        return len(self.abandoned_threads) > 0
+
 
 if __name__ == "__main__":
     game_instance = Dots_and_Boxes(